@@ -0,0 +1,247 @@
+import asyncio
+import datetime
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import discord
+
+logger = logging.getLogger("red.trusty-cogs.ExtendedModLog")
+
+# entries fetched per request, discord returns at most 100
+AUDIT_LOG_LIMIT = 100
+# entries fetched for a single action when the shared request missed it
+ACTION_LIMIT = 25
+# how long before a lookup an entry can be created and still belong to the event
+AUDIT_LOG_RECENT = datetime.timedelta(seconds=10)
+# entry counts remembered to spot repeats discord merged into an older entry
+MAX_COUNTS = 1000
+
+AuditKey = Tuple[discord.AuditLogAction, int]
+
+
+class CoalescedFetch:
+    """
+    Shares one request between every caller that asks while it's in flight
+
+    When nothing is being fetched the request is made right away.
+    Otherwise the request in flight may have been sent before the caller's
+    event was logged, so one more request is queued behind it and every
+    caller until it starts shares that one.
+    """
+
+    def __init__(self, request: Callable[[], Awaitable[None]]):
+        self.request = request
+        self._running: Optional[asyncio.Task] = None
+        self._next: Optional[asyncio.Task] = None
+
+    def __call__(self) -> asyncio.Task:
+        if self._next is not None:
+            return self._next
+        if self._running is None:
+            self._running = asyncio.create_task(self._fetch())
+            return self._running
+        self._next = asyncio.create_task(self._fetch(after=self._running))
+        return self._next
+
+    async def _fetch(self, after: Optional[asyncio.Task] = None) -> None:
+        if after is not None:
+            try:
+                await asyncio.wait([after])
+            finally:
+                # events from here on could be missed by this request
+                self._next = None
+            self._running = asyncio.current_task()
+        try:
+            await self.request()
+        finally:
+            if self._running is asyncio.current_task():
+                self._running = None
+
+    def cancel(self) -> None:
+        for task in (self._running, self._next):
+            if task is not None:
+                task.cancel()
+
+
+class GuildAuditLog:
+    """The most recent audit log entries in a guild indexed for the event handlers"""
+
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self.by_action: Dict[discord.AuditLogAction, List[discord.AuditLogEntry]] = {}
+        self.by_target: Dict[AuditKey, List[discord.AuditLogEntry]] = {}
+        # creation time of the oldest entry when the shared page was full
+        self.oldest: Optional[datetime.datetime] = None
+        # pages for a single action fetched when the shared page didn't reach back far enough
+        self.action_entries: Dict[discord.AuditLogAction, List[discord.AuditLogEntry]] = {}
+        # entry ID to `extra.count` when last seen and the entries whose count went up
+        self._counts: Dict[int, int] = {}
+        self.repeated: Set[int] = set()
+        self.refresh = CoalescedFetch(self._request)
+        self._action_fetches: Dict[discord.AuditLogAction, CoalescedFetch] = {}
+
+    def _track_counts(self, entries: List[discord.AuditLogEntry]) -> None:
+        """
+        Discord merges repeats of some actions, like deleting several messages
+        from the same author, into the existing entry and only raises its count
+        so those entries keep the creation time of the first action.
+        """
+        for entry in entries:
+            count = getattr(entry.extra, "count", None)
+            if count is None:
+                continue
+            previous = self._counts.pop(entry.id, None)
+            if previous is not None and count > previous:
+                self.repeated.add(entry.id)
+            else:
+                self.repeated.discard(entry.id)
+            self._counts[entry.id] = count
+        while len(self._counts) > MAX_COUNTS:
+            entry_id = next(iter(self._counts))
+            del self._counts[entry_id]
+            self.repeated.discard(entry_id)
+
+    async def _request(self) -> None:
+        entries: List[discord.AuditLogEntry] = []
+        try:
+            async for entry in self.guild.audit_logs(limit=AUDIT_LOG_LIMIT):
+                entries.append(entry)
+        except discord.HTTPException:
+            logger.debug("Could not fetch the audit log for %s", self.guild.id, exc_info=True)
+            return
+        by_action: Dict[discord.AuditLogAction, List[discord.AuditLogEntry]] = {}
+        by_target: Dict[AuditKey, List[discord.AuditLogEntry]] = {}
+        for entry in entries:
+            by_action.setdefault(entry.action, []).append(entry)
+            target_id = getattr(entry.target, "id", None)
+            if target_id is not None:
+                by_target.setdefault((entry.action, target_id), []).append(entry)
+        self._track_counts(entries)
+        self.by_action = by_action
+        self.by_target = by_target
+        self.oldest = entries[-1].created_at if len(entries) >= AUDIT_LOG_LIMIT else None
+
+    async def _request_action(self, action: discord.AuditLogAction) -> None:
+        try:
+            entries = [e async for e in self.guild.audit_logs(limit=ACTION_LIMIT, action=action)]
+        except discord.HTTPException:
+            logger.debug("Could not fetch the audit log for %s", self.guild.id, exc_info=True)
+            return
+        self._track_counts(entries)
+        self.action_entries[action] = entries
+
+    def missed(self, after: datetime.datetime) -> bool:
+        """True when the shared page may not hold every entry since `after`"""
+        return self.oldest is not None and self.oldest > after
+
+    async def fetch_action(self, action: discord.AuditLogAction) -> List[discord.AuditLogEntry]:
+        fetch = self._action_fetches.get(action)
+        if fetch is None:
+            fetch = self._action_fetches[action] = CoalescedFetch(
+                lambda: self._request_action(action)
+            )
+        await asyncio.shield(fetch())
+        return self.action_entries.get(action, [])
+
+    def find(
+        self,
+        entries: List[discord.AuditLogEntry],
+        target_id: Optional[int],
+        check: Optional[Callable[[discord.AuditLogEntry], bool]],
+        after: datetime.datetime,
+    ) -> List[discord.AuditLogEntry]:
+        """`entries` on `target_id` passing `check` created or repeated since `after`"""
+        found = []
+        for entry in entries:
+            if target_id is not None and getattr(entry.target, "id", None) != target_id:
+                continue
+            if entry.created_at < after and entry.id not in self.repeated:
+                continue
+            if check is not None and not check(entry):
+                continue
+            found.append(entry)
+        return found
+
+    def cancel(self) -> None:
+        self.refresh.cancel()
+        for fetch in self._action_fetches.values():
+            fetch.cancel()
+
+
+class AuditLogCache:
+    """
+    Shared audit log lookups for every event handler
+
+    Handlers ask for entries by action and target instead of paging
+    through the audit log themselves. Lookups in the same guild made while
+    a request is in flight share the next request and entries are indexed
+    by `(action, target_id)` so each lookup is a dict access. Only entries
+    created since `after`, `AUDIT_LOG_RECENT` before the lookup unless given, can
+    match. When a burst of other actions pushed that far back out of the
+    shared page the lookup falls back to a request filtered by its action,
+    shared the same way.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, GuildAuditLog] = {}
+
+    async def _update(self, guild: discord.Guild) -> GuildAuditLog:
+        audit_log = self.guilds.get(guild.id)
+        if audit_log is None:
+            audit_log = self.guilds[guild.id] = GuildAuditLog(guild)
+        await asyncio.shield(audit_log.refresh())
+        return audit_log
+
+    async def _lookup(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        target_id: Optional[int],
+        check: Optional[Callable[[discord.AuditLogEntry], bool]],
+        after: Optional[datetime.datetime],
+    ) -> List[discord.AuditLogEntry]:
+        if after is None:
+            after = datetime.datetime.utcnow() - AUDIT_LOG_RECENT
+        audit_log = await self._update(guild)
+        if target_id is None:
+            entries = audit_log.by_action.get(action, [])
+        else:
+            entries = audit_log.by_target.get((action, target_id), [])
+        found = audit_log.find(entries, target_id, check, after)
+        if not found and audit_log.missed(after):
+            entries = await audit_log.fetch_action(action)
+            found = audit_log.find(entries, target_id, check, after)
+        return found
+
+    async def get_entries(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        after: Optional[datetime.datetime] = None,
+    ) -> List[discord.AuditLogEntry]:
+        """Entries for `action` created since `after` newest first"""
+        return await self._lookup(guild, action, None, None, after)
+
+    async def get_entry(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        target_id: Optional[int] = None,
+        check: Optional[Callable[[discord.AuditLogEntry], bool]] = None,
+        after: Optional[datetime.datetime] = None,
+    ) -> Optional[discord.AuditLogEntry]:
+        """
+        The newest entry for `action` on `target_id` passing `check`
+        that was created, or repeated, since `after`
+        """
+        found = await self._lookup(guild, action, target_id, check, after)
+        return found[0] if found else None
+
+    def remove(self, guild_id: int) -> None:
+        audit_log = self.guilds.pop(guild_id, None)
+        if audit_log is not None:
+            audit_log.cancel()
+
+    def clear(self) -> None:
+        for guild_id in list(self.guilds):
+            self.remove(guild_id)
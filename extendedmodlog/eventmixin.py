@@ -1,7 +1,7 @@
 import asyncio
 import datetime
 import logging
-from typing import Sequence, Union, cast
+from typing import Optional, Sequence, Union, cast
 
 import discord
 from discord.ext.commands.converter import Converter
@@ -11,6 +11,16 @@ from redbot.core.bot import Red
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils.chat_formatting import escape, humanize_list, inline, humanize_timedelta
 
+from .auditlog import AUDIT_LOG_RECENT, AuditLogCache
+from .messagestore import (
+    PURGE_INTERVAL,
+    MessageStore,
+    RestoredMessage,
+    StoredAuthor,
+    StoredMessage,
+)
+from .sendqueue import ModLogQueue
+
 _ = Translator("ExtendedModLog", __file__)
 logger = logging.getLogger("red.trusty-cogs.ExtendedModLog")
 
@@ -78,6 +88,9 @@ class EventMixin:
         self.bot: Red
         self.settings: dict
         self._ban_cache: dict
+        self.audit_log: AuditLogCache
+        self.modlog_queue: ModLogQueue
+        self.message_store: MessageStore
 
     async def get_colour(self, channel: discord.TextChannel) -> discord.Colour:
         try:
@@ -127,6 +140,28 @@ class EventMixin:
             return True
         return False
 
+    def is_store_ignored(self, guild: discord.Guild, channel: discord.abc.GuildChannel) -> bool:
+        ignored_channels = self.settings[guild.id]["message_store"]["ignored_channels"]
+        if channel.id in ignored_channels:
+            return True
+        if channel.category_id and channel.category_id in ignored_channels:
+            return True
+        return False
+
+    def restore_message(
+        self, guild: discord.Guild, stored: StoredMessage
+    ) -> Optional[RestoredMessage]:
+        """
+        Rebuild a stored message if its channel still exists
+
+        Authors who left or were banned are rebuilt from the stored name.
+        """
+        channel = guild.get_channel(stored.channel_id)
+        if channel is None:
+            return None
+        author = guild.get_member(stored.author_id) or self.bot.get_user(stored.author_id)
+        return RestoredMessage(stored, channel, author or StoredAuthor(stored))
+
     async def member_can_run(self, ctx: commands.Context) -> bool:
         """Check if a user can run a command.
         This will take the current context into account, such as the
@@ -251,9 +286,33 @@ class EventMixin:
                 member=message.author, m_id=message.author.id
             )
             embed.set_author(name=author_title, icon_url=message.author.avatar_url)
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(infomessage[:2000])
+            await self.modlog_queue.send(channel, infomessage[:2000])
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        guild = message.guild
+        if guild is None or guild.id not in self.message_store.guilds:
+            return
+        if not message.content and not message.attachments:
+            return
+        settings = self.settings[guild.id]
+        if message.author.bot and not (
+            settings["message_delete"]["bots"] or settings["message_edit"]["bots"]
+        ):
+            return
+        if self.is_store_ignored(guild, message.channel):
+            return
+        if await self.is_ignored_channel(guild, message.channel):
+            return
+        self.message_store.add(guild.id, StoredMessage.from_message(message))
+
+    async def message_store_loop(self) -> None:
+        """Save stored messages and purge expired ones every minute"""
+        while True:
+            await asyncio.sleep(PURGE_INTERVAL)
+            await self.message_store.purge()
 
     @commands.Cog.listener(name="on_raw_message_delete")
     async def on_raw_message_delete_listener(
@@ -266,6 +325,7 @@ class EventMixin:
         guild = self.bot.get_guild(guild_id)
         if guild.id not in self.settings:
             return
+        stored = await self.message_store.pop(guild.id, payload.message_id)
         if version_info >= VersionInfo.from_str("3.4.0"):
             if await self.bot.cog_disabled_in_guild(self, guild):
                 return
@@ -285,6 +345,8 @@ class EventMixin:
             and self.settings[guild.id]["message_delete"]["embed"]
         )
         message = payload.cached_message
+        if message is None and stored is not None:
+            message = self.restore_message(guild, stored)
         if message is None:
             if settings["cached_only"]:
                 return
@@ -296,14 +358,16 @@ class EventMixin:
                 )
                 embed.add_field(name=_("Channel"), value=message_channel.mention)
                 embed.set_author(name=_("Deleted Message"))
-                await channel.send(embed=embed)
+                await self.modlog_queue.send(channel, embed=embed)
             else:
                 infomessage = _("{emoji} `{time}` A message was deleted in {channel}").format(
                     emoji=settings["emoji"],
                     time=datetime.datetime.utcnow().strftime("%H:%M:%S"),
                     channel=message_channel.mention,
                 )
-                await channel.send(f"{infomessage}\n> *Message's content unknown.*")
+                await self.modlog_queue.send(
+                    channel, f"{infomessage}\n> *Message's content unknown.*"
+                )
             return
         await self._cached_message_delete(
             message, guild, settings, channel, check_audit_log=check_audit_log
@@ -329,13 +393,19 @@ class EventMixin:
         )
         time = message.created_at
         perp = None
+        # repeated deletes merged into an older entry still match through its count
+        deleted_after = datetime.datetime.utcnow() - AUDIT_LOG_RECENT
         if channel.permissions_for(guild.me).view_audit_log and check_audit_log:
             action = discord.AuditLogAction.message_delete
-            async for log in guild.audit_logs(limit=2, action=action):
-                same_chan = log.extra.channel.id == message.channel.id
-                if log.target.id == message.author.id and same_chan:
-                    perp = f"{log.user}({log.user.id})"
-                    break
+            entry = await self.audit_log.get_entry(
+                guild,
+                action,
+                message.author.id,
+                check=lambda e: e.extra.channel.id == message.channel.id,
+                after=deleted_after,
+            )
+            if entry:
+                perp = f"{entry.user}({entry.user.id})"
         message_channel = cast(discord.TextChannel, message.channel)
         author = message.author
         if perp is None:
@@ -379,12 +449,12 @@ class EventMixin:
                 name=_("{member} ({m_id})- Deleted Message").format(member=author, m_id=author.id),
                 icon_url=str(message.author.avatar_url),
             )
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
             clean_msg = escape(message.clean_content, mass_mentions=True)[
                 : (1990 - len(infomessage))
             ]
-            await channel.send(f"{infomessage}\n>>> {clean_msg}")
+            await self.modlog_queue.send(channel, f"{infomessage}\n>>> {clean_msg}")
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
@@ -421,7 +491,7 @@ class EventMixin:
             embed.set_author(name=_("Bulk message delete"), icon_url=guild.icon_url)
             embed.add_field(name=_("Channel"), value=message_channel.mention)
             embed.add_field(name=_("Messages deleted"), value=str(message_amount))
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
             infomessage = _(
                 "{emoji} `{time}` Bulk message delete in {channel}, {amount} messages deleted."
@@ -431,17 +501,23 @@ class EventMixin:
                 amount=message_amount,
                 channel=message_channel.mention,
             )
-            await channel.send(infomessage)
+            await self.modlog_queue.send(channel, infomessage)
         if settings["bulk_individual"]:
-            for message in payload.cached_messages:
+            cached = {message.id: message for message in payload.cached_messages}
+            for message_id in sorted(payload.message_ids):
+                message = cached.get(message_id)
+                if message is None and await self.message_store.get(guild_id, message_id) is None:
+                    continue
                 new_payload = discord.RawMessageDeleteEvent(
-                    {"id": message.id, "channel_id": channel_id, "guild_id": guild_id}
+                    {"id": message_id, "channel_id": channel_id, "guild_id": guild_id}
                 )
                 new_payload.cached_message = message
                 try:
                     await self.on_raw_message_delete_listener(new_payload, check_audit_log=False)
                 except Exception:
                     pass
+        for message_id in payload.message_ids:
+            self.message_store.remove(guild_id, message_id)
 
     async def invite_links_loop(self) -> None:
         """Check every 5 minutes for updates to the invite links"""
@@ -493,10 +569,9 @@ class EventMixin:
         if member.bot:
             if check_logs:
                 action = discord.AuditLogAction.bot_add
-                async for log in guild.audit_logs(action=action):
-                    if log.target.id == member.id:
-                        possible_link = _("Added by: {inviter}").format(inviter=str(log.user))
-                        break
+                entry = await self.audit_log.get_entry(guild, action, member.id)
+                if entry:
+                    possible_link = _("Added by: {inviter}").format(inviter=str(entry.user))
             return possible_link
         if manage_guild and "VANITY_URL" in guild.features:
             possible_link = str(await guild.vanity_invite())
@@ -542,12 +617,13 @@ class EventMixin:
             await self.save_invite_links(guild)  # Save all the invites again since they've changed
         if check_logs and not possible_link:
             action = discord.AuditLogAction.invite_create
-            async for log in guild.audit_logs(action=action):
-                if log.target.code not in invites:
-                    possible_link = _("https://discord.gg/{code}\nInvited by: {inviter}").format(
-                        code=log.target.code, inviter=str(log.target.inviter)
-                    )
-                    break
+            entry = await self.audit_log.get_entry(
+                guild, action, check=lambda e: e.target.code not in invites
+            )
+            if entry:
+                possible_link = _("https://discord.gg/{code}\nInvited by: {inviter}").format(
+                    code=entry.target.code, inviter=str(entry.target.inviter)
+                )
         return possible_link
 
     @commands.Cog.listener()
@@ -597,7 +673,7 @@ class EventMixin:
             if possible_link:
                 embed.add_field(name=_("Invite Link"), value=possible_link)
             embed.set_thumbnail(url=member.avatar_url)
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
             time = datetime.datetime.utcnow()
             msg = _(
@@ -610,7 +686,7 @@ class EventMixin:
                 m_id=member.id,
                 users=users,
             )
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, member: discord.Member):
@@ -650,11 +726,10 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.kick
-            async for log in guild.audit_logs(limit=5, after=check_after, action=action):
-                if log.target.id == member.id:
-                    perp = log.user
-                    reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, member.id, after=check_after)
+            if entry:
+                perp = entry.user
+                reason = entry.reason
         if embed_links:
             embed = discord.Embed(
                 description=member.mention,
@@ -674,7 +749,7 @@ class EventMixin:
                 icon_url=member.avatar_url,
             )
             embed.set_thumbnail(url=member.avatar_url)
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
             time = datetime.datetime.utcnow()
             msg = _(
@@ -698,7 +773,7 @@ class EventMixin:
                     perp=perp,
                     users=len(guild.members),
                 )
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     async def get_permission_change(
         self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel, embed_links: bool
@@ -778,12 +853,11 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.channel_create
-            async for log in guild.audit_logs(limit=2, action=action):
-                if log.target.id == new_channel.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, new_channel.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
 
         perp_msg = ""
         embed.add_field(name=_("Type"), value=channel_type)
@@ -801,9 +875,9 @@ class EventMixin:
             channel=new_channel.mention,
         )
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, old_channel: discord.abc.GuildChannel):
@@ -841,12 +915,11 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.channel_delete
-            async for log in guild.audit_logs(limit=2, action=action):
-                if log.target.id == old_channel.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, old_channel.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         perp_msg = ""
         embed.add_field(name=_("Type"), value=channel_type)
         if perp:
@@ -863,9 +936,9 @@ class EventMixin:
             channel=f"#{old_channel.name} ({old_channel.id})",
         )
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_channel_update(
@@ -911,12 +984,11 @@ class EventMixin:
         worth_updating = False
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.channel_update
-            async for log in guild.audit_logs(limit=5, action=action):
-                if log.target.id == before.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, before.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         if type(before) == discord.TextChannel:
             text_updates = {
                 "name": _("Name:"),
@@ -982,9 +1054,9 @@ class EventMixin:
         if not worth_updating:
             return
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
 
     async def get_role_permission_change(self, before: discord.Role, after: discord.Role) -> str:
         permission_list = [
@@ -1043,12 +1115,11 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.role_update
-            async for log in guild.audit_logs(limit=5, action=action):
-                if log.target.id == before.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, before.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         embed_links = (
             channel.permissions_for(guild.me).embed_links
             and self.settings[guild.id]["role_change"]["embed"]
@@ -1100,9 +1171,9 @@ class EventMixin:
         if not worth_updating:
             return
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_role_create(self, role: discord.Role) -> None:
@@ -1122,12 +1193,11 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.role_create
-            async for log in guild.audit_logs(limit=5, action=action):
-                if log.target.id == role.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, role.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         embed_links = (
             channel.permissions_for(guild.me).embed_links
             and self.settings[guild.id]["role_create"]["embed"]
@@ -1153,9 +1223,9 @@ class EventMixin:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role) -> None:
@@ -1175,12 +1245,11 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.role_delete
-            async for log in guild.audit_logs(limit=5, action=action):
-                if log.target.id == role.id:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(guild, action, role.id)
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         embed_links = (
             channel.permissions_for(guild.me).embed_links
             and self.settings[guild.id]["role_delete"]["embed"]
@@ -1206,9 +1275,9 @@ class EventMixin:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
@@ -1233,6 +1302,50 @@ class EventMixin:
             return
         if await self.is_ignored_channel(guild, after.channel):
             return
+        await self._message_edit(before, after.content, guild, channel)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        guild_id = payload.data.get("guild_id")
+        content = payload.data.get("content")
+        if guild_id is None or content is None:
+            return
+        guild = self.bot.get_guild(int(guild_id))
+        if guild is None or guild.id not in self.message_store.guilds:
+            return
+        stored = await self.message_store.get(guild.id, payload.message_id)
+        if stored is None:
+            return
+        self.message_store.edit(guild.id, stored, content)
+        if payload.cached_message is not None or stored.content == content:
+            # on_message_edit logs messages still in discord.py's cache
+            return
+        if version_info >= VersionInfo.from_str("3.4.0"):
+            if await self.bot.cog_disabled_in_guild(self, guild):
+                return
+        settings = self.settings[guild.id]["message_edit"]
+        if not settings["enabled"]:
+            return
+        before = self.restore_message(guild, stored)
+        if before is None:
+            return
+        if before.author.bot and not settings["bots"]:
+            return
+        try:
+            channel = await self.modlog_channel(guild, "message_edit")
+        except RuntimeError:
+            return
+        if await self.is_ignored_channel(guild, before.channel):
+            return
+        await self._message_edit(before, content, guild, channel)
+
+    async def _message_edit(
+        self,
+        before: Union[discord.Message, RestoredMessage],
+        after_content: str,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+    ) -> None:
         embed_links = (
             channel.permissions_for(guild.me).embed_links
             and self.settings[guild.id]["message_edit"]["embed"]
@@ -1245,7 +1358,7 @@ class EventMixin:
                 colour=await self.get_event_colour(guild, "message_edit"),
                 timestamp=before.created_at,
             )
-            jump_url = f"[Click to see new message]({after.jump_url})"
+            jump_url = f"[Click to see new message]({before.jump_url})"
             embed.add_field(name=_("After Message:"), value=jump_url)
             embed.add_field(name=_("Channel:"), value=before.channel.mention)
             embed.set_author(
@@ -1254,7 +1367,7 @@ class EventMixin:
                 ),
                 icon_url=str(before.author.avatar_url),
             )
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
             msg = _(
                 "{emoji} `{time}` **{author}** (`{a_id}`) edited a message "
@@ -1266,9 +1379,9 @@ class EventMixin:
                 a_id=before.author.id,
                 channel=before.channel.mention,
                 before=escape(before.content, mass_mentions=True),
-                after=escape(after.content, mass_mentions=True),
+                after=escape(after_content, mass_mentions=True),
             )
-            await channel.send(msg[:2000])
+            await self.modlog_queue.send(channel, msg[:2000])
 
     @commands.Cog.listener()
     async def on_guild_update(self, before: discord.Guild, after: discord.Guild) -> None:
@@ -1329,10 +1442,11 @@ class EventMixin:
         reasons = []
         if channel.permissions_for(guild.me).view_audit_log:
             action = discord.AuditLogAction.guild_update
-            async for log in guild.audit_logs(limit=int(len(embed.fields) / 2), action=action):
-                perps.append(log.user)
-                if log.reason:
-                    reasons.append(log.reason)
+            entries = await self.audit_log.get_entries(guild, action)
+            for entry in entries[: int(len(embed.fields) / 2)]:
+                perps.append(entry.user)
+                if entry.reason:
+                    reasons.append(entry.reason)
         if perps:
             perp_s = ", ".join(str(p) for p in perps)
             msg += _("Update by ") + f"{perp_s}\n"
@@ -1343,9 +1457,9 @@ class EventMixin:
             msg += _("Reasons ") + f"{reasons}\n"
             embed.add_field(name=_("Reasons "), value=s_reasons, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_emojis_update(
@@ -1473,11 +1587,11 @@ class EventMixin:
             return
         if channel.permissions_for(guild.me).view_audit_log:
             if action:
-                async for log in guild.audit_logs(limit=1, action=action):
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+                entry = await self.audit_log.get_entry(guild, action)
+                if entry:
+                    perp = entry.user
+                    if entry.reason:
+                        reason = entry.reason
         if perp:
             embed.add_field(name=_("Updated by "), value=perp.mention)
             msg += _("Updated by ") + str(perp) + "\n"
@@ -1485,9 +1599,9 @@ class EventMixin:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_voice_state_update(
@@ -1582,22 +1696,22 @@ class EventMixin:
         reason = None
         if channel.permissions_for(guild.me).view_audit_log and change_type:
             action = discord.AuditLogAction.member_update
-            async for log in guild.audit_logs(limit=5, action=action):
-                is_change = getattr(log.after, change_type, None)
-                if log.target.id == member.id and is_change:
-                    perp = log.user
-                    if log.reason:
-                        reason = log.reason
-                    break
+            entry = await self.audit_log.get_entry(
+                guild, action, member.id, check=lambda e: getattr(e.after, change_type, None)
+            )
+            if entry:
+                perp = entry.user
+                if entry.reason:
+                    reason = entry.reason
         if perp:
             embed.add_field(name=_("Updated by"), value=perp.mention)
         if reason:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
@@ -1666,21 +1780,19 @@ class EventMixin:
                             worth_sending = True
                     if channel.permissions_for(guild.me).view_audit_log:
                         action = discord.AuditLogAction.member_role_update
-                        async for log in guild.audit_logs(limit=5, action=action):
-                            if log.target.id == before.id:
-                                perp = log.user
-                                if log.reason:
-                                    reason = log.reason
-                                break
+                        entry = await self.audit_log.get_entry(guild, action, before.id)
+                        if entry:
+                            perp = entry.user
+                            if entry.reason:
+                                reason = entry.reason
                 else:
                     if channel.permissions_for(guild.me).view_audit_log:
                         action = discord.AuditLogAction.member_update
-                        async for log in guild.audit_logs(limit=5, action=action):
-                            if log.target.id == before.id:
-                                perp = log.user
-                                if log.reason:
-                                    reason = log.reason
-                                break
+                        entry = await self.audit_log.get_entry(guild, action, before.id)
+                        if entry:
+                            perp = entry.user
+                            if entry.reason:
+                                reason = entry.reason
                     worth_sending = True
                     msg += _("Before ") + f"{name} {before_attr}\n"
                     msg += _("After ") + f"{name} {after_attr}\n"
@@ -1698,9 +1810,9 @@ class EventMixin:
             msg += _("Reason: ") + f"{reason}\n"
             embed.add_field(name=_("Reason"), value=reason, inline=False)
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(msg)
+            await self.modlog_queue.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_invite_create(self, invite: discord.Invite) -> None:
@@ -1774,9 +1886,9 @@ class EventMixin:
         if not worth_updating:
             return
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
 
     @commands.Cog.listener()
     async def on_invite_delete(self, invite: discord.Invite) -> None:
@@ -1835,6 +1947,6 @@ class EventMixin:
         if not worth_updating:
             return
         if embed_links:
-            await channel.send(embed=embed)
+            await self.modlog_queue.send(channel, embed=embed)
         else:
-            await channel.send(escape(msg, mass_mentions=True))
+            await self.modlog_queue.send(channel, escape(msg, mass_mentions=True))
@@ -1,12 +1,16 @@
 import logging
-from typing import Union
+from typing import Literal, Union
 
 import discord
 from redbot.core import Config, checks, commands, modlog
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import humanize_list
+from redbot.core.utils.chat_formatting import humanize_list, humanize_timedelta
 
+from .auditlog import AuditLogCache
 from .eventmixin import CommandPrivs, EventChooser, EventMixin
+from .messagestore import MessageStore
+from .sendqueue import ModLogQueue
 from .settings import inv_settings
 
 _ = Translator("ExtendedModLog", __file__)
@@ -30,7 +34,11 @@ class ExtendedModLog(EventMixin, commands.Cog):
         self.config.register_global(version="0.0.0")
         self.settings = {}
         self._ban_cache = {}
+        self.audit_log = AuditLogCache()
+        self.modlog_queue = ModLogQueue()
+        self.message_store = MessageStore(cog_data_path(self) / "messages.sqlite3")
         self.loop = bot.loop.create_task(self.invite_links_loop())
+        self.message_store_task = bot.loop.create_task(self.message_store_loop())
 
     def format_help_for_context(self, ctx: commands.Context):
         """
@@ -39,11 +47,16 @@ class ExtendedModLog(EventMixin, commands.Cog):
         pre_processed = super().format_help_for_context(ctx)
         return f"{pre_processed}\n\nCog Version: {self.__version__}"
 
-    async def red_delete_data_for_user(self, **kwargs):
+    async def red_delete_data_for_user(
+        self,
+        *,
+        requester: Literal["discord_deleted_user", "owner", "user", "user_strict"],
+        user_id: int,
+    ):
         """
-        Nothing to delete
+        Method for finding users data inside the cog and deleting it.
         """
-        return
+        await self.message_store.delete_author(user_id)
 
     async def initialize(self) -> None:
         all_data = await self.config.all_guilds()
@@ -68,6 +81,7 @@ class ExtendedModLog(EventMixin, commands.Cog):
                 logger.info("Saving all guild data to new version type")
                 await self.config.guild(guild).set(all_data[guild_id])
                 await self.config.version.set("2.8.5")
+            self.message_store.configure(guild_id, all_data[guild_id]["message_store"])
 
         self.settings = all_data
 
@@ -667,5 +681,140 @@ class ExtendedModLog(EventMixin, commands.Cog):
         else:
             await ctx.send(channel.mention + _(" is not being ignored."))
 
-    def __unload(self):
+    async def _set_message_store(self, guild: discord.Guild, settings: dict) -> None:
+        await self.config.guild(guild).message_store.set(settings)
+        if self.settings.get(guild.id, inv_settings) is inv_settings:
+            self.settings[guild.id] = await self.config.guild(guild).all()
+        self.settings[guild.id]["message_store"] = settings
+        self.message_store.configure(guild.id, settings)
+
+    @_modlog.group(name="messagestore", aliases=["store"], invoke_without_command=True)
+    async def _message_store(self, ctx: commands.Context) -> None:
+        """
+        Keep recent message content for deletes and edits of uncached messages
+
+        The bot only remembers a limited number of messages so older deletes
+        and edits are logged without their content. When enabled this server's
+        messages are kept for a limited time so they can be logged in full.
+        """
+        settings = await self.config.guild(ctx.guild).message_store()
+        ignored = [ctx.guild.get_channel(c) for c in settings["ignored_channels"]]
+        msg = _(
+            "Message store: **{enabled}**\n"
+            "Messages kept: **{max_messages}**\n"
+            "Kept for: **{ttl}**\n"
+            "Saved to disk: **{sqlite}**\n"
+        ).format(
+            enabled=settings["enabled"],
+            max_messages=settings["max_messages"],
+            ttl=humanize_timedelta(seconds=settings["ttl"]),
+            sqlite=settings["sqlite"],
+        )
+        if any(ignored):
+            chans = ", ".join(c.mention for c in ignored if c is not None)
+            msg += _("Ignored Channels") + ": " + chans
+        await ctx.maybe_send_embed(msg)
+
+    @_message_store.command(name="toggle")
+    async def _message_store_toggle(self, ctx: commands.Context) -> None:
+        """
+        Toggle keeping recent message content in this server
+
+        Disabling the message store removes everything it has kept.
+        """
+        settings = await self.config.guild(ctx.guild).message_store()
+        settings["enabled"] = not settings["enabled"]
+        await self._set_message_store(ctx.guild, settings)
+        if settings["enabled"]:
+            await ctx.send(_("Recent message content will now be kept for modlogs."))
+        else:
+            await ctx.send(_("Recent message content will no longer be kept for modlogs."))
+
+    @_message_store.command(name="size")
+    async def _message_store_size(self, ctx: commands.Context, max_messages: int) -> None:
+        """
+        Set how many messages are kept in this server
+
+        `max_messages` must be between 100 and 100000.
+        """
+        if not 100 <= max_messages <= 100000:
+            return await ctx.send(_("The number of messages must be between 100 and 100000."))
+        settings = await self.config.guild(ctx.guild).message_store()
+        settings["max_messages"] = max_messages
+        await self._set_message_store(ctx.guild, settings)
+        await ctx.send(_("Keeping up to {number} messages.").format(number=max_messages))
+
+    @_message_store.command(name="time", aliases=["ttl"])
+    async def _message_store_ttl(self, ctx: commands.Context, hours: int) -> None:
+        """
+        Set how many hours messages are kept for
+
+        `hours` must be between 1 and 336 (two weeks).
+        """
+        if not 1 <= hours <= 336:
+            return await ctx.send(_("The number of hours must be between 1 and 336."))
+        settings = await self.config.guild(ctx.guild).message_store()
+        settings["ttl"] = hours * 3600
+        await self._set_message_store(ctx.guild, settings)
+        await ctx.send(
+            _("Messages will be kept for {time}.").format(
+                time=humanize_timedelta(seconds=settings["ttl"])
+            )
+        )
+
+    @_message_store.command(name="sqlite", aliases=["disk"])
+    async def _message_store_sqlite(self, ctx: commands.Context) -> None:
+        """
+        Toggle saving kept messages to disk
+
+        Messages saved to disk are still available after the bot restarts
+        and only the newest are held in memory.
+        """
+        settings = await self.config.guild(ctx.guild).message_store()
+        settings["sqlite"] = not settings["sqlite"]
+        await self._set_message_store(ctx.guild, settings)
+        if settings["sqlite"]:
+            await ctx.send(_("Kept messages will now be saved to disk."))
+        else:
+            await ctx.send(_("Kept messages will now only be held in memory."))
+
+    @_message_store.command(name="ignore")
+    async def _message_store_ignore(
+        self, ctx: commands.Context, channel: Union[discord.TextChannel, discord.CategoryChannel]
+    ) -> None:
+        """
+        Stop keeping messages sent in a channel
+
+        `channel` the channel or category to stop keeping messages from
+        """
+        settings = await self.config.guild(ctx.guild).message_store()
+        if channel.id in settings["ignored_channels"]:
+            return await ctx.send(channel.mention + _(" is already being ignored."))
+        settings["ignored_channels"].append(channel.id)
+        await self._set_message_store(ctx.guild, settings)
+        await ctx.send(_("Messages in {channel} will not be kept.").format(channel=channel.mention))
+
+    @_message_store.command(name="unignore")
+    async def _message_store_unignore(
+        self, ctx: commands.Context, channel: Union[discord.TextChannel, discord.CategoryChannel]
+    ) -> None:
+        """
+        Keep messages sent in a channel again
+
+        `channel` the channel or category to keep messages from
+        """
+        settings = await self.config.guild(ctx.guild).message_store()
+        if channel.id not in settings["ignored_channels"]:
+            return await ctx.send(channel.mention + _(" is not being ignored."))
+        settings["ignored_channels"].remove(channel.id)
+        await self._set_message_store(ctx.guild, settings)
+        await ctx.send(_("Messages in {channel} will be kept.").format(channel=channel.mention))
+
+    def cog_unload(self):
         self.loop.cancel()
+        self.message_store_task.cancel()
+        self.audit_log.clear()
+        self.modlog_queue.flush()
+        self.message_store.close()
+
+    __unload = cog_unload
@@ -0,0 +1,419 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import discord
+
+logger = logging.getLogger("red.trusty-cogs.ExtendedModLog")
+
+# messages kept in memory per guild when the sqlite file holds the rest
+MEMORY_MESSAGES = 1000
+# seconds between writing new messages to sqlite and purging expired ones
+PURGE_INTERVAL = 60
+
+DISCORD_EPOCH = 1420070400000
+MASS_MENTIONS = re.compile(r"@(everyone|here)")
+USER_MENTIONS = re.compile(r"<@!?([0-9]{15,21})>")
+ROLE_MENTIONS = re.compile(r"<@&([0-9]{15,21})>")
+CHANNEL_MENTIONS = re.compile(r"<#([0-9]{15,21})>")
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        guild_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        author_id INTEGER NOT NULL,
+        author_name TEXT NOT NULL,
+        author_bot INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        attachments TEXT NOT NULL,
+        PRIMARY KEY (guild_id, message_id)
+    )
+    """,
+)
+UPSERT = """
+    INSERT OR REPLACE INTO messages (
+        guild_id, message_id, channel_id, author_id, author_name, author_bot,
+        content, attachments
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+COLUMNS = "message_id, channel_id, author_id, author_name, author_bot, content, attachments"
+
+
+def snowflake_before(seconds: float) -> int:
+    """The lowest snowflake created `seconds` ago"""
+    return int((time.time() - seconds) * 1000 - DISCORD_EPOCH) << 22
+
+
+class StoredMessage(NamedTuple):
+    id: int
+    channel_id: int
+    author_id: int
+    author_name: str
+    author_bot: bool
+    content: str
+    attachments: Tuple[str, ...]
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "StoredMessage":
+        return cls(
+            id=message.id,
+            channel_id=message.channel.id,
+            author_id=message.author.id,
+            author_name=str(message.author),
+            author_bot=message.author.bot,
+            content=message.content,
+            attachments=tuple(a.filename for a in message.attachments),
+        )
+
+
+class StoredAttachment(NamedTuple):
+    filename: str
+
+
+class StoredAuthor(discord.Object):
+    """Stands in for the author of a stored message who can't be found any more"""
+
+    def __init__(self, stored: StoredMessage):
+        super().__init__(id=stored.author_id)
+        self.name = stored.author_name
+        self.bot = stored.author_bot
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    @property
+    def avatar_url(self) -> str:
+        return f"https://cdn.discordapp.com/embed/avatars/{self.id % 5}.png"
+
+
+def clean_content(content: str, guild: discord.Guild) -> str:
+    """Resolve mentions to names like `discord.Message.clean_content`"""
+
+    def user_name(match) -> str:
+        member = guild.get_member(int(match.group(1)))
+        return f"@{member.display_name}" if member else f"@{match.group(1)}"
+
+    def role_name(match) -> str:
+        role = guild.get_role(int(match.group(1)))
+        return f"@{role.name}" if role else "@deleted-role"
+
+    def channel_name(match) -> str:
+        channel = guild.get_channel(int(match.group(1)))
+        return f"#{channel.name}" if channel else "#deleted-channel"
+
+    content = USER_MENTIONS.sub(user_name, content)
+    content = ROLE_MENTIONS.sub(role_name, content)
+    content = CHANNEL_MENTIONS.sub(channel_name, content)
+    return MASS_MENTIONS.sub("@\u200b\\1", content)
+
+
+class RestoredMessage:
+    """
+    A message rebuilt from the store with the attributes the modlog uses
+    so it can be logged like a message from discord.py's cache
+    """
+
+    def __init__(
+        self,
+        stored: StoredMessage,
+        channel: discord.TextChannel,
+        author: Union[discord.Member, discord.User, StoredAuthor],
+    ):
+        self.id = stored.id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = stored.content
+        self.clean_content = clean_content(stored.content, channel.guild)
+        self.attachments = [StoredAttachment(name) for name in stored.attachments]
+        self.created_at = discord.utils.snowflake_time(stored.id)
+        self.jump_url = f"https://discord.com/channels/{self.guild.id}/{channel.id}/{stored.id}"
+
+
+class GuildMessages:
+    """Ring buffer of the most recent messages in a guild"""
+
+    def __init__(self, max_messages: int, ttl: int, persist: bool):
+        self.messages: "OrderedDict[int, StoredMessage]" = OrderedDict()
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.persist = persist
+
+    @property
+    def memory_size(self) -> int:
+        if self.persist:
+            return min(self.max_messages, MEMORY_MESSAGES)
+        return self.max_messages
+
+    def add(self, message: StoredMessage) -> None:
+        self.messages[message.id] = message
+        while len(self.messages) > self.memory_size:
+            self.messages.popitem(last=False)
+
+    def purge(self) -> None:
+        # messages arrive close to snowflake order so expired ones are at the front
+        oldest = snowflake_before(self.ttl)
+        while self.messages:
+            message_id = next(iter(self.messages))
+            if message_id >= oldest:
+                break
+            del self.messages[message_id]
+
+
+class MessageStore:
+    """
+    Recent message content for guilds that opt in
+
+    discord.py only keeps a limited number of messages in its cache so
+    deletes and edits of older messages arrive without any content. This
+    keeps `max_messages` per guild for up to `ttl` seconds in a ring
+    buffer, optionally writing them to a local sqlite file which holds the
+    full amount while memory keeps only the newest `MEMORY_MESSAGES`.
+    Writes to sqlite are batched and made by `purge`. Every sqlite read
+    and write runs on a single background thread so the event loop never
+    waits on the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.guilds: Dict[int, GuildMessages] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="modlog_messages")
+        self._unsaved: Dict[int, Tuple[int, StoredMessage]] = {}
+        self._removed: Set[Tuple[int, int]] = set()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    def configure(self, guild_id: int, settings: dict) -> None:
+        """Apply a guild's `message_store` settings dropping everything if disabled"""
+        if not settings["enabled"]:
+            self.remove_guild(guild_id)
+            return
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = GuildMessages(
+                settings["max_messages"], settings["ttl"], settings["sqlite"]
+            )
+        if guild.persist and not settings["sqlite"]:
+            self._forget_unsaved(guild_id)
+            self._delete_guild_rows(guild_id)
+        guild.max_messages = settings["max_messages"]
+        guild.ttl = settings["ttl"]
+        guild.persist = settings["sqlite"]
+        while len(guild.messages) > guild.memory_size:
+            guild.messages.popitem(last=False)
+
+    def add(self, guild_id: int, message: StoredMessage) -> None:
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return
+        guild.add(message)
+        if guild.persist:
+            self._unsaved[message.id] = (guild_id, message)
+
+    async def _run(self, func, *args):
+        """Run `func` on the store's thread after anything already queued"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _read(self, guild_id: int, message_id: int) -> Optional[StoredMessage]:
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    f"SELECT {COLUMNS} FROM messages WHERE guild_id = ? AND message_id = ?",
+                    (guild_id, message_id),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Error reading stored message %s", message_id)
+            return None
+        if row is None:
+            return None
+        *fields, attachments = row
+        return StoredMessage(*fields, tuple(filter(None, attachments.split("\n"))))
+
+    async def get(self, guild_id: int, message_id: int) -> Optional[StoredMessage]:
+        guild = self.guilds.get(guild_id)
+        if guild is None or message_id < snowflake_before(guild.ttl):
+            return None
+        message = guild.messages.get(message_id)
+        if message is not None or not guild.persist:
+            return message
+        if message_id in self._unsaved:
+            return self._unsaved[message_id][1]
+        if (guild_id, message_id) in self._removed or not self.path.exists():
+            return None
+        message = await self._run(self._read, guild_id, message_id)
+        if message is None or (guild_id, message_id) in self._removed:
+            # removed while it was being read
+            return None
+        return message
+
+    def edit(self, guild_id: int, message: StoredMessage, content: str) -> None:
+        """Replace the content of a stored message after it's edited"""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return
+        message = message._replace(content=content)
+        if message.id in guild.messages:
+            guild.messages[message.id] = message
+        if guild.persist:
+            self._unsaved[message.id] = (guild_id, message)
+
+    async def pop(self, guild_id: int, message_id: int) -> Optional[StoredMessage]:
+        """Remove a deleted message from the store returning what was kept"""
+        message = await self.get(guild_id, message_id)
+        if message is not None:
+            self.remove(guild_id, message_id)
+        return message
+
+    def remove(self, guild_id: int, message_id: int) -> None:
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return
+        guild.messages.pop(message_id, None)
+        if guild.persist:
+            self._unsaved.pop(message_id, None)
+            self._removed.add((guild_id, message_id))
+
+    def remove_guild(self, guild_id: int) -> None:
+        guild = self.guilds.pop(guild_id, None)
+        if guild is None:
+            return
+        if guild.persist:
+            self._forget_unsaved(guild_id)
+            self._delete_guild_rows(guild_id)
+
+    def _forget_unsaved(self, guild_id: int) -> None:
+        for message_id in [k for k, (g, __) in self._unsaved.items() if g == guild_id]:
+            del self._unsaved[message_id]
+        self._removed = {(g, m) for g, m in self._removed if g != guild_id}
+
+    def _delete_guild_rows(self, guild_id: int) -> None:
+        def delete():
+            try:
+                with self._lock, self.conn:
+                    self.conn.execute("DELETE FROM messages WHERE guild_id = ?", (guild_id,))
+            except sqlite3.Error:
+                logger.exception("Error deleting stored messages for %s", guild_id)
+
+        self._executor.submit(delete)
+
+    def _delete_author_rows(self, author_id: int) -> None:
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM messages WHERE author_id = ?", (author_id,))
+        except sqlite3.Error:
+            logger.exception("Error deleting stored messages by %s", author_id)
+
+    async def delete_author(self, author_id: int) -> None:
+        for guild in self.guilds.values():
+            for message_id in [k for k, m in guild.messages.items() if m.author_id == author_id]:
+                del guild.messages[message_id]
+        for message_id in [k for k, (__, m) in self._unsaved.items() if m.author_id == author_id]:
+            del self._unsaved[message_id]
+        if self.path.exists():
+            await self._run(self._delete_author_rows, author_id)
+
+    def _take_changes(self) -> Tuple[List[Tuple[int, StoredMessage]], List[Tuple[int, int]]]:
+        unsaved = list(self._unsaved.values())
+        removed = list(self._removed)
+        self._unsaved.clear()
+        self._removed.clear()
+        return unsaved, removed
+
+    async def flush(self) -> None:
+        """Write new, edited and deleted messages to sqlite"""
+        if not self._unsaved and not self._removed:
+            return
+        unsaved, removed = self._take_changes()
+        await self._run(self._write, unsaved, removed)
+
+    def _write(
+        self, unsaved: List[Tuple[int, StoredMessage]], removed: List[Tuple[int, int]]
+    ) -> None:
+        if not unsaved and not removed:
+            return
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    UPSERT,
+                    ((g, *m[:-1], "\n".join(m.attachments)) for g, m in unsaved),
+                )
+                self.conn.executemany(
+                    "DELETE FROM messages WHERE guild_id = ? AND message_id = ?", removed
+                )
+        except sqlite3.Error:
+            logger.exception("Error saving stored messages")
+
+    async def purge(self) -> None:
+        """Drop expired messages and trim sqlite down to each guild's size"""
+        for guild in self.guilds.values():
+            guild.purge()
+        await self.flush()
+        if not self.path.exists():
+            return
+        # guild ID to the oldest message and number of messages to keep
+        limits = {
+            g: (snowflake_before(guild.ttl), guild.max_messages)
+            for g, guild in self.guilds.items()
+            if guild.persist
+        }
+        await self._run(self._purge_rows, limits)
+
+    def _purge_rows(self, limits: Dict[int, Tuple[int, int]]) -> None:
+        try:
+            with self._lock, self.conn:
+                stored = [g for g, in self.conn.execute("SELECT DISTINCT guild_id FROM messages")]
+                for guild_id in stored:
+                    if guild_id not in limits:
+                        self.conn.execute("DELETE FROM messages WHERE guild_id = ?", (guild_id,))
+                        continue
+                    oldest, max_messages = limits[guild_id]
+                    self.conn.execute(
+                        "DELETE FROM messages WHERE guild_id = ? AND message_id < ?",
+                        (guild_id, oldest),
+                    )
+                    self.conn.execute(
+                        "DELETE FROM messages WHERE guild_id = ? AND message_id <= ("
+                        "SELECT message_id FROM messages WHERE guild_id = ? "
+                        "ORDER BY message_id DESC LIMIT 1 OFFSET ?)",
+                        (guild_id, guild_id, max_messages),
+                    )
+        except sqlite3.Error:
+            logger.exception("Error purging stored messages")
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def close(self) -> None:
+        """Write what's unsaved and close the connection once the queue is done"""
+        if self._unsaved or self._removed:
+            self._executor.submit(self._write, *self._take_changes())
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,172 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger("red.trusty-cogs.ExtendedModLog")
+
+# seconds to wait for more events before sending what's queued for a channel
+SEND_DELAY = 1.0
+# discord's limits for a single message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+MAX_CONTENT = 2000
+# seconds before looking for a webhook again in a channel we couldn't get one in
+WEBHOOK_RETRY = 300
+# Messageable.send only accepts a list of embeds on newer versions of discord.py
+CAN_SEND_EMBEDS = "embeds" in inspect.signature(discord.abc.Messageable.send).parameters
+
+QueueItem = Tuple[Optional[str], Optional[discord.Embed]]
+
+
+class ModLogQueue:
+    """
+    Per channel queue for modlog messages
+
+    Events are queued instead of sent right away. Once a channel has
+    `MAX_EMBEDS` events waiting or `SEND_DELAY` seconds have passed the
+    queue is sent in order with consecutive embeds packed into a single
+    message and consecutive text joined together. Packing embeds uses a
+    webhook the bot already owns in the channel when discord.py can't send
+    several embeds in one channel message, we never create one.
+    """
+
+    def __init__(self):
+        self._queues: Dict[int, Deque[QueueItem]] = {}
+        self._full: Dict[int, asyncio.Event] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._webhooks: Dict[int, discord.Webhook] = {}
+        self._webhook_retry: Dict[int, float] = {}
+
+    async def send(
+        self,
+        channel: discord.TextChannel,
+        content: Optional[str] = None,
+        *,
+        embed: Optional[discord.Embed] = None,
+    ) -> None:
+        queue = self._queues.setdefault(channel.id, deque())
+        queue.append((content, embed))
+        full = self._full.setdefault(channel.id, asyncio.Event())
+        if len(queue) >= MAX_EMBEDS:
+            full.set()
+        if channel.id not in self._tasks:
+            self._tasks[channel.id] = asyncio.create_task(self._run(channel))
+
+    async def _run(self, channel: discord.TextChannel) -> None:
+        queue = self._queues[channel.id]
+        full = self._full[channel.id]
+        try:
+            try:
+                await asyncio.wait_for(full.wait(), timeout=SEND_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            while queue:
+                full.clear()
+                content, embeds = await self._next_batch(channel, queue)
+                try:
+                    await self._send(channel, content, embeds)
+                except discord.HTTPException:
+                    logger.error("Error sending to modlog channel %s", channel.id, exc_info=True)
+        finally:
+            self._tasks.pop(channel.id, None)
+            if not queue:
+                self._queues.pop(channel.id, None)
+                self._full.pop(channel.id, None)
+
+    async def _next_batch(
+        self, channel: discord.TextChannel, queue: Deque[QueueItem]
+    ) -> Tuple[Optional[str], List[discord.Embed]]:
+        """Take the next run of items that fit in one message keeping their order"""
+        content, embed = queue.popleft()
+        if content is not None and embed is not None:
+            return content, [embed]
+        if embed is not None:
+            embeds = [embed]
+            max_embeds = MAX_EMBEDS
+            if not CAN_SEND_EMBEDS and await self._get_webhook(channel) is None:
+                max_embeds = 1
+            size = len(embed)
+            while queue and len(embeds) < max_embeds:
+                next_content, next_embed = queue[0]
+                if next_content is not None or next_embed is None:
+                    break
+                if size + len(next_embed) > MAX_EMBED_CHARACTERS:
+                    break
+                queue.popleft()
+                embeds.append(next_embed)
+                size += len(next_embed)
+            return None, embeds
+        lines = [content]
+        size = len(content)
+        while queue:
+            next_content, next_embed = queue[0]
+            if next_embed is not None or size + len(next_content) + 1 > MAX_CONTENT:
+                break
+            queue.popleft()
+            lines.append(next_content)
+            size += len(next_content) + 1
+        return "\n".join(lines), []
+
+    async def _send(
+        self, channel: discord.TextChannel, content: Optional[str], embeds: List[discord.Embed]
+    ) -> None:
+        if len(embeds) <= 1:
+            await channel.send(content, embed=embeds[0] if embeds else None)
+            return
+        if CAN_SEND_EMBEDS:
+            await channel.send(content, embeds=embeds)
+            return
+        webhook = self._webhooks.get(channel.id)
+        if webhook is not None:
+            try:
+                await webhook.send(
+                    content,
+                    embeds=embeds,
+                    username=channel.guild.me.display_name,
+                    avatar_url=str(channel.guild.me.avatar_url),
+                )
+                return
+            except (discord.NotFound, discord.Forbidden):
+                # the webhook was deleted since we found it
+                self._webhooks.pop(channel.id, None)
+        for embed in embeds:
+            await channel.send(content, embed=embed)
+            content = None
+
+    async def _get_webhook(self, channel: discord.TextChannel) -> Optional[discord.Webhook]:
+        """An existing webhook in the channel the bot created and can post with"""
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+        if time.monotonic() < self._webhook_retry.get(channel.id, 0):
+            return None
+        me = channel.guild.me
+        webhook = None
+        if channel.permissions_for(me).manage_webhooks:
+            try:
+                webhook = next(
+                    (
+                        w
+                        for w in await channel.webhooks()
+                        if w.token and w.user is not None and w.user.id == me.id
+                    ),
+                    None,
+                )
+            except discord.HTTPException:
+                logger.debug("Could not get a webhook in %s", channel.id, exc_info=True)
+        if webhook is None:
+            # check again later in case permissions change or a webhook is added
+            self._webhook_retry[channel.id] = time.monotonic() + WEBHOOK_RETRY
+            return None
+        self._webhook_retry.pop(channel.id, None)
+        self._webhooks[channel.id] = webhook
+        return webhook
+
+    def flush(self) -> None:
+        """Stop waiting for more events and send everything that's queued"""
+        for full in self._full.values():
+            full.set()
@@ -126,6 +126,13 @@ inv_settings = {
         "emoji": "",
         "embed": True,
     },
+    "message_store": {
+        "enabled": False,
+        "max_messages": 5000,
+        "ttl": 86400,
+        "sqlite": False,
+        "ignored_channels": [],
+    },
     "ignored_channels": [],
     "invite_links": {},
 }
@@ -0,0 +1,305 @@
+import functools
+import warnings
+from typing import FrozenSet, Iterable, List, Optional, Pattern
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse  # type: ignore
+
+try:
+    import regex as re
+except ImportError:
+    import re
+
+SRE_FLAG_IGNORECASE = 2
+SRE_FLAG_MULTILINE = 8
+SRE_FLAG_VERBOSE = 64
+
+REPEATS = tuple(
+    getattr(sre_parse, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, op)
+)
+GROUPS = tuple(
+    getattr(sre_parse, op) for op in ("SUBPATTERN", "ATOMIC_GROUP") if hasattr(sre_parse, op)
+)
+BACKREFERENCES = (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+# largest character range we'll expand before treating it as any character
+MAX_RANGE = 0x3000
+# pairs of categories that never share a character
+DISJOINT_CATEGORIES = {
+    frozenset(["CATEGORY_DIGIT", "CATEGORY_SPACE"]),
+    frozenset(["CATEGORY_WORD", "CATEGORY_SPACE"]),
+}
+# casefold() misses the dotless i and dotted capital I which the re module treats as an i
+_FOLD_FIXES = {0x130: "i", 0x131: "i"}
+CATEGORY_REGEX = {
+    "CATEGORY_DIGIT": re.compile(r"\d"),
+    "CATEGORY_WORD": re.compile(r"\w"),
+    "CATEGORY_SPACE": re.compile(r"\s"),
+}
+
+
+class PatternRisk(Exception):
+    """Raised internally with the reason a pattern can backtrack badly"""
+
+
+class CharSet:
+    """
+    A conservative model of the characters a part of a pattern can match
+
+    `chars` are case folded so case-insensitive patterns are covered and
+    `categories` are the names of `\\d`, `\\w` and `\\s` style classes.
+    A negated set matches anything except those. Anything we can't model
+    becomes `CharSet.any()`.
+    """
+
+    def __init__(
+        self, chars: Iterable[int] = (), categories: Iterable[str] = (), negated: bool = False
+    ):
+        self.chars: FrozenSet[str] = frozenset(
+            chr(c).translate(_FOLD_FIXES).casefold() for c in chars
+        )
+        self.categories: FrozenSet[str] = frozenset(categories)
+        self.negated = negated
+
+    @classmethod
+    def any(cls) -> "CharSet":
+        return cls(negated=True)
+
+    def union(self, other: "CharSet") -> "CharSet":
+        if self.negated or other.negated:
+            return CharSet.any()
+        new = CharSet()
+        new.chars = self.chars | other.chars
+        new.categories = self.categories | other.categories
+        return new
+
+    def _contains(self, char: str) -> bool:
+        """Whether a positive set could match this character"""
+        if char in self.chars:
+            return True
+        return any(CATEGORY_REGEX[c].match(char) for c in self.categories)
+
+    def overlaps(self, other: "CharSet") -> bool:
+        if self.negated and other.negated:
+            return True
+        if self.negated or other.negated:
+            negated, positive = (self, other) if self.negated else (other, self)
+            if positive.categories - negated.categories:
+                return True
+            return any(not negated._contains(c) for c in positive.chars)
+        if self.chars & other.chars:
+            return True
+        if any(other._contains(c) for c in self.chars):
+            return True
+        if any(self._contains(c) for c in other.chars):
+            return True
+        for first in self.categories:
+            for second in other.categories:
+                if frozenset([first, second]) not in DISJOINT_CATEGORIES:
+                    return True
+        return False
+
+
+def _category_name(category) -> Optional[str]:
+    name = getattr(category, "name", str(category))
+    if name in CATEGORY_REGEX:
+        return name
+    return None
+
+
+def _charset_in(av: list) -> CharSet:
+    chars: List[int] = []
+    categories: List[str] = []
+    negated = False
+    for op, value in av:
+        if op is sre_parse.NEGATE:
+            negated = True
+        elif op is sre_parse.LITERAL:
+            chars.append(value)
+        elif op is sre_parse.RANGE:
+            low, high = value
+            if high - low > MAX_RANGE:
+                return CharSet.any()
+            chars.extend(range(low, high + 1))
+        elif op is sre_parse.CATEGORY and _category_name(value):
+            categories.append(_category_name(value))
+        else:
+            return CharSet.any()
+    return CharSet(chars, categories, negated)
+
+
+def _charset(items: Iterable) -> CharSet:
+    """Every character a piece of a pattern could consume"""
+    result = CharSet()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            result = result.union(CharSet([av]))
+        elif op is sre_parse.IN:
+            result = result.union(_charset_in(av))
+        elif op in REPEATS:
+            result = result.union(_charset(av[2]))
+        elif op in GROUPS:
+            result = result.union(_charset(av[-1]))
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                result = result.union(_charset(branch))
+        elif op is sre_parse.NOT_LITERAL:
+            result = result.union(CharSet([av], negated=True))
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            # zero width
+            continue
+        else:
+            return CharSet.any()
+    return result
+
+
+def _first_charset(items: Iterable) -> Optional[CharSet]:
+    """Characters the items can start with or None if they might match nothing"""
+    for op, av in items:
+        if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        if op is sre_parse.LITERAL:
+            return CharSet([av])
+        if op is sre_parse.IN:
+            return _charset_in(av)
+        if op in REPEATS and av[0] >= 1:
+            return _first_charset(av[2])
+        if op in GROUPS:
+            return _first_charset(av[-1])
+        if op is sre_parse.BRANCH:
+            result = CharSet()
+            for branch in av[1]:
+                first = _first_charset(branch)
+                if first is None:
+                    return None
+                result = result.union(first)
+            return result
+        if op is sre_parse.ANY:
+            return CharSet.any()
+        if op is sre_parse.NOT_LITERAL:
+            return CharSet([av], negated=True)
+        # optional repeats could start with whatever follows them
+        return None
+    return None
+
+
+def _walk(items: Iterable, in_repeat: bool, quantifiers: List[CharSet]) -> None:
+    for op, av in items:
+        if op in BACKREFERENCES:
+            raise PatternRisk("backreference")
+        elif op in REPEATS:
+            low, high, sub = av
+            if low != high and in_repeat:
+                raise PatternRisk("nested quantifier")
+            if low != high and high > 1:
+                charset = _charset(sub)
+                for other in quantifiers:
+                    if other.overlaps(charset):
+                        raise PatternRisk("overlapping quantifiers")
+                quantifiers.append(charset)
+            _walk(sub, in_repeat or high > 1, quantifiers)
+        elif op is sre_parse.BRANCH:
+            branches = av[1]
+            if in_repeat:
+                firsts = [_first_charset(b) for b in branches]
+                if any(f is None for f in firsts):
+                    raise PatternRisk("overlapping alternation")
+                for i, first in enumerate(firsts):
+                    for second in firsts[i + 1 :]:
+                        if first.overlaps(second):
+                            raise PatternRisk("overlapping alternation")
+            for branch in branches:
+                _walk(branch, in_repeat, quantifiers)
+        elif op in GROUPS:
+            _walk(av[-1], in_repeat, quantifiers)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _walk(av[1], in_repeat, quantifiers)
+
+
+def _required(op, av) -> bool:
+    """Whether an item has to consume at least one character to match"""
+    if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.IN, sre_parse.ANY):
+        return True
+    if op in REPEATS:
+        return av[0] >= 1 and any(_required(o, a) for o, a in av[2])
+    if op in GROUPS:
+        return any(_required(o, a) for o, a in av[-1])
+    if op is sre_parse.BRANCH:
+        return all(any(_required(o, a) for o, a in branch) for branch in av[1])
+    return False
+
+
+def _broad(items: Iterable) -> bool:
+    """Whether a repeated piece can match more than one distinct character"""
+    items = list(items)
+    if any(op is sre_parse.BRANCH for op, __ in items):
+        return True
+    charset = _charset(items)
+    return charset.negated or bool(charset.categories) or len(charset.chars) > 1
+
+
+def _scan(items: Iterable, followed: bool) -> None:
+    """
+    search and findall retry the pattern from every position so an unbounded
+    repeat over a broad class or alternation that still needs something after
+    it rescans the rest of the message from each start
+    """
+    items = list(items)
+    for i, (op, av) in enumerate(items):
+        after = followed or any(_required(o, a) for o, a in items[i + 1 :])
+        if op in REPEATS:
+            low, high, sub = av
+            if high == sre_parse.MAXREPEAT and after and _broad(sub):
+                raise PatternRisk("unbounded repeat before a required match")
+        elif op in GROUPS:
+            _scan(av[-1], after)
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                _scan(branch, after)
+
+
+def _anchored(items: Iterable, flags: int) -> bool:
+    """Whether the pattern can only start matching at the start of the message"""
+    for op, av in items:
+        if op is not sre_parse.AT:
+            return False
+        if av is sre_parse.AT_BEGINNING_STRING:
+            return True
+        if av is sre_parse.AT_BEGINNING and not flags & SRE_FLAG_MULTILINE:
+            return True
+    return False
+
+
+@functools.lru_cache(maxsize=1024)
+def _analyze(pattern: str, flags: int) -> Optional[str]:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            parsed = sre_parse.parse(pattern, flags & SRE_FLAG_VERBOSE)
+    except Exception:
+        return "could not be analyzed"
+    try:
+        _walk(parsed, False, [])
+        if not _anchored(parsed, flags):
+            _scan(parsed, False)
+    except PatternRisk as e:
+        return str(e)
+    return None
+
+
+def analyze_pattern(regex: Pattern) -> Optional[str]:
+    """
+    Statically check a compiled pattern for patterns that backtrack badly
+
+    Returns None when none of the checks found a problem: nested quantifiers,
+    overlapping alternations inside a repeat, overlapping quantifiers,
+    backreferences or an unanchored unbounded repeat of a broad class before
+    something required. Passing isn't a guarantee the pattern is fast, only
+    that it's a reasonable candidate to run on the event loop. Otherwise
+    returns a short reason the pattern should be run in the regex sandbox.
+    """
+    return _analyze(regex.pattern, regex.flags)
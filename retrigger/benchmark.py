@@ -0,0 +1,295 @@
+"""
+Offline replay benchmark for ReTrigger matching
+
+Loads a guild's exported `trigger_list` and replays a corpus of messages
+through `TriggerHandler.check_triggers` using stub discord objects so no
+connection is needed. Triggers never perform their actions, matches are
+only counted.
+
+Usage:
+    python -m retrigger.benchmark trigger_list.json messages.txt
+
+`trigger_list.json` is the guild's `trigger_list` from the cog's config
+either as the `{name: trigger}` mapping or a list of triggers.
+`messages.txt` has one message per line.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+import discord
+
+from .cache import TTLCache
+from .converters import Trigger
+from .profiling import TriggerProfiler
+from .registry import TriggerRegistry
+from .sandbox import PatternPool
+from .triggerhandler import MOD_TTL, PREFIX_TTL, TriggerHandler
+
+GUILD_ID = 1
+CHANNEL_ID = 2
+AUTHOR_ID = 3
+STRATEGIES = ("inline", "pool", "batch", "auto")
+
+
+class StubMember:
+    def __init__(self, guild: "StubGuild"):
+        self.id = AUTHOR_ID
+        self.name = "benchmark"
+        self.bot = False
+        self.roles: list = []
+        self.guild = guild
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class StubGuild:
+    def __init__(self):
+        self.id = GUILD_ID
+        self.name = "benchmark"
+        self.owner = None
+        self.member = StubMember(self)
+
+    def get_member(self, member_id: int) -> Optional[StubMember]:
+        return self.member if member_id == AUTHOR_ID else None
+
+
+class StubChannel:
+    def __init__(self, guild: StubGuild):
+        self.id = CHANNEL_ID
+        self.category_id = None
+        self.guild = guild
+
+    def permissions_for(self, member: StubMember) -> discord.Permissions:
+        return discord.Permissions.none()
+
+
+class StubMessage:
+    def __init__(self, message_id: int, content: str, channel: StubChannel):
+        self.id = message_id
+        self.content = content
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = channel.guild.member
+        self.attachments: list = []
+
+
+class StubBot:
+    """Only what `check_triggers` needs before a trigger is performed"""
+
+    async def allowed_by_whitelist_blacklist(self, member: StubMember) -> bool:
+        return True
+
+    async def command_prefix(self, bot: "StubBot", message: StubMessage) -> List[str]:
+        return ["[p]"]
+
+    def get_command(self, name: str) -> None:
+        return None
+
+    async def is_owner(self, member: StubMember) -> bool:
+        return False
+
+    async def is_admin(self, member: StubMember) -> bool:
+        return False
+
+    async def is_mod(self, member: StubMember) -> bool:
+        return False
+
+    async def is_automod_immune(self, message: StubMessage) -> bool:
+        return False
+
+
+class StubValue:
+    def __init__(self, value):
+        self.value = value
+
+    async def __call__(self):
+        return self.value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class StubConfig:
+    def __init__(self, bypass: bool):
+        self.bypass = StubValue(bypass)
+        self.trigger_list = StubValue({})
+
+    def guild(self, guild: StubGuild) -> "StubConfig":
+        return self
+
+
+class BenchmarkHandler(TriggerHandler):
+    """
+    TriggerHandler wired to stubs
+
+    `perform_trigger` only counts the match, cooldowns are ignored and
+    OCR reads no text so every strategy sees exactly the same work.
+    """
+
+    def __init__(
+        self, triggers: List[Trigger], strategy: str, timeout: float, pool: Optional[PatternPool]
+    ):
+        registry = TriggerRegistry()
+        for trigger in triggers:
+            if strategy in ("pool", "batch"):
+                # send everything to the pool regardless of the analyzer
+                trigger.risk = "benchmark"
+            registry.add(trigger)
+        self.bot = StubBot()
+        self.config = StubConfig(bypass=strategy == "inline")
+        self.triggers = {GUILD_ID: registry}
+        self.prefilters = {}
+        self.scopes = {}
+        self.re_pool = pool
+        self.trigger_timeout = timeout
+        self.batch_search = strategy in ("batch", "auto")
+        self.dirty_counts = {}
+        self.prefix_cache = TTLCache(1024, PREFIX_TTL)
+        self.mod_cache = TTLCache(1024, MOD_TTL)
+        self.profiler = TriggerProfiler()
+        self.hits: Counter = Counter()
+
+    async def check_trigger_cooldown(self, message, trigger) -> bool:
+        return False
+
+    async def get_image_text(self, message) -> str:
+        # the corpus is plain text so OCR triggers only search the message
+        return ""
+
+    async def perform_trigger(self, message, trigger, find) -> None:
+        self.hits[trigger.name] += 1
+
+
+async def load_triggers(path: Path) -> List[Trigger]:
+    with path.open(encoding="utf-8") as fp:
+        data = json.load(fp)
+    if isinstance(data, dict):
+        data = list(data.values())
+    triggers = []
+    for trigger in data:
+        try:
+            triggers.append(await Trigger.from_json(trigger))
+        except Exception as e:
+            print(f"Skipping {trigger.get('name')}: {e}")
+    return triggers
+
+
+async def run(
+    strategy: str,
+    trigger_path: Path,
+    corpus: List[str],
+    repeat: int,
+    timeout: float,
+    processes: Optional[int],
+    top: int,
+) -> None:
+    triggers = await load_triggers(trigger_path)
+    pool = None
+    if strategy != "inline":
+        pool = PatternPool(processes)
+    try:
+        handler = BenchmarkHandler(triggers, strategy, timeout, pool)
+        if pool is not None:
+            # compile patterns up front so only matching is timed
+            sandboxed = [t for t in handler.triggers[GUILD_ID] if t.risk is not None]
+            await pool.preload(GUILD_ID, sandboxed)
+        channel = StubChannel(StubGuild())
+        messages = [
+            StubMessage(index, content, channel) for index, content in enumerate(corpus * repeat)
+        ]
+        start = time.perf_counter()
+        for message in messages:
+            await handler.check_triggers(message, False)
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    report(strategy, handler, len(triggers), len(messages), elapsed, top)
+
+
+def report(
+    strategy: str,
+    handler: BenchmarkHandler,
+    triggers: int,
+    messages: int,
+    elapsed: float,
+    top: int,
+) -> None:
+    profiles = handler.profiler.guilds.get(GUILD_ID, {})
+    searches = sum(h["regex"].count for h in profiles.values() if "regex" in h)
+    regex_ms = sum(h["regex"].total for h in profiles.values() if "regex" in h)
+    inline = sum(1 for t in handler.triggers[GUILD_ID] if t.risk is None)
+    print(f"strategy:      {strategy}")
+    print(f"triggers:      {triggers} ({inline} inline, {triggers - inline} sandboxed)")
+    print(f"messages:      {messages}")
+    print(f"matches:       {sum(handler.hits.values())}")
+    print(f"elapsed:       {elapsed:.3f}s")
+    print(f"throughput:    {messages / elapsed if elapsed else 0:.1f} messages/s")
+    print(f"per message:   {elapsed * 1000 / max(messages, 1):.3f}ms")
+    print(f"regex search:  {searches} searches taking {regex_ms:.1f}ms")
+    # everything other than running the patterns: prefiltering, checks and pool IPC
+    print(f"overhead:      {elapsed * 1000 - regex_ms:.1f}ms")
+    print()
+    row = "{:<30} {:>8} {:>10} {:>8} {:>8} {:>8}"
+    print(row.format("trigger", "searches", "total ms", "p50", "p95", "p99"))
+    ranked = sorted(
+        ((name, h["regex"]) for name, h in profiles.items() if "regex" in h),
+        key=lambda item: item[1].total,
+        reverse=True,
+    )
+    for name, histogram in ranked[:top]:
+        print(
+            row.format(
+                name[:30],
+                histogram.count,
+                "{:.2f}".format(histogram.total),
+                histogram.percentile(50),
+                histogram.percentile(95),
+                histogram.percentile(99),
+            )
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("triggers", type=Path, help="exported trigger_list JSON")
+    parser.add_argument("corpus", type=Path, help="file with one message per line")
+    parser.add_argument(
+        "--strategy",
+        choices=STRATEGIES,
+        action="append",
+        help="matching strategy to run, can be given more than once (default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="replay the corpus this many times")
+    parser.add_argument("--timeout", type=float, default=1, help="trigger timeout in seconds")
+    parser.add_argument("--processes", type=int, default=None, help="regex pool size")
+    parser.add_argument("--top", type=int, default=10, help="number of triggers to list")
+    args = parser.parse_args(argv)
+    corpus = args.corpus.read_text(encoding="utf-8").splitlines()
+    for strategy in args.strategy or STRATEGIES:
+        asyncio.run(
+            run(
+                strategy,
+                args.triggers,
+                corpus,
+                args.repeat,
+                args.timeout,
+                args.processes,
+                args.top,
+            )
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+
+class LRUCache:
+    """
+    Small least recently used cache
+
+    Once `maxsize` entries are stored the least recently read or written
+    entry is dropped to make room. When `weigh` is given entries count as
+    `weigh(value)` towards `maxsize` instead of 1, e.g. `len` to limit the
+    total bytes held.
+    """
+
+    def __init__(self, maxsize: int, weigh: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.weigh = weigh or (lambda value: 1)
+        self.size = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.pop(key)
+        weight = self.weigh(value)
+        if weight > self.maxsize:
+            return
+        self._data[key] = value
+        self.size += weight
+        while self.size > self.maxsize:
+            __, old = self._data.popitem(last=False)
+            self.size -= self.weigh(old)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self.size -= self.weigh(value)
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Remove every entry whose key matches `predicate`"""
+        for key in [k for k in self._data if predicate(k)]:
+            self.pop(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    Files stored under `directory` by key
+
+    Only used while `enabled` is True. Once more than `max_files` are saved
+    the oldest files are removed.
+    """
+
+    def __init__(self, directory: Path, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self.enabled = False
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        try:
+            return (self.directory / key).read_bytes()
+        except OSError:
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / key).write_bytes(data)
+        except OSError:
+            log.error("Error saving to the disk cache in %s", self.directory, exc_info=True)
+            return
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        try:
+            files = sorted(self.directory.iterdir(), key=lambda f: f.stat().st_mtime)
+            for file in files[: max(len(files) - self.max_files, 0)]:
+                file.unlink()
+        except OSError:
+            log.error("Error pruning the disk cache in %s", self.directory, exc_info=True)
+
+
+class TTLCache(LRUCache):
+    """
+    LRUCache whose entries also expire `ttl` seconds after they're set
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            self.pop(key)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        super().set(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = super().pop(key)
+        if entry is None:
+            return default
+        return entry[1]
@@ -1,6 +1,7 @@
 import asyncio
+import itertools
 import logging
-from typing import List, Pattern, Tuple, Union
+from typing import FrozenSet, List, Optional, Pattern, Tuple, Union
 
 import discord
 from discord.ext.commands.converter import Converter, IDConverter, RoleConverter
@@ -10,6 +11,10 @@ from redbot.core.i18n import Translator
 from redbot.core.utils.menus import start_adding_reactions
 from redbot.core.utils.predicates import ReactionPredicate
 
+from .analyzer import analyze_pattern
+from .cooldown import Cooldown
+from .prefilter import extract_literals
+
 log = logging.getLogger("red.trusty-cogs.ReTrigger")
 _ = Translator("ReTrigger", __file__)
 
@@ -18,6 +23,8 @@ try:
 except ImportError:
     import re
 
+_VERSIONS = itertools.count(1)
+
 
 class MultiResponse(Converter):
     """
@@ -123,15 +130,18 @@ class Trigger:
     """
 
     name: str
-    regex: Pattern
+    literals: Optional[FrozenSet[str]]
+    risk: Optional[str]
+    sandbox: bool
+    version: int
     response_type: list
     author: int
     count: int
     image: Union[List[Union[int, str]], str, None]
     text: Union[List[Union[int, str]], str, None]
-    whitelist: list
-    blacklist: list
-    cooldown: dict
+    whitelist: FrozenSet[int]
+    blacklist: FrozenSet[int]
+    cooldown: Optional[Cooldown]
     multi_payload: Union[List[MultiResponse], Tuple[MultiResponse, ...]]
     created: int
     ignore_commands: bool
@@ -146,15 +156,20 @@ class Trigger:
             self.regex = re.compile(regex)
         except Exception:
             raise
+        if kwargs.get("sandbox", False):
+            self.demote()
         self.response_type = response_type
         self.author = author
         self.enabled = kwargs.get("enabled", True)
         self.count = kwargs.get("count", 0)
         self.image = kwargs.get("image", None)
         self.text = kwargs.get("text", None)
-        self.whitelist = kwargs.get("whitelist", [])
-        self.blacklist = kwargs.get("blacklist", [])
-        self.cooldown = kwargs.get("cooldown", {})
+        self.whitelist = frozenset(kwargs.get("whitelist", []))
+        self.blacklist = frozenset(kwargs.get("blacklist", []))
+        cooldown = kwargs.get("cooldown", None)
+        if isinstance(cooldown, dict):
+            cooldown = Cooldown.from_json(cooldown) if cooldown else None
+        self.cooldown = cooldown
         self.multi_payload = kwargs.get("multi_payload", [])
         self.created_at = kwargs.get("created_at", 0)
         self.ignore_commands = kwargs.get("ignore_commands", False)
@@ -164,6 +179,37 @@ class Trigger:
         self.read_filenames = kwargs.get("read_filenames", False)
         self.chance = kwargs.get("chance", 0)
 
+    @property
+    def regex(self) -> Pattern:
+        return self._regex
+
+    @regex.setter
+    def regex(self, pattern: Pattern) -> None:
+        """
+        Replacing the pattern gives the trigger a new version which invalidates
+        any copy of the old pattern cached elsewhere.
+
+        `risk` is None when the analyzer found no reason to keep the pattern
+        off the event loop otherwise it's the reason it runs in the regex sandbox.
+        A pattern demoted for being slow inline stays sandboxed until the
+        pattern itself is changed.
+        """
+        old = getattr(self, "_regex", None)
+        self._regex = pattern
+        if old is None or old.pattern != pattern.pattern:
+            self.sandbox = False
+        self.literals = extract_literals(pattern)
+        self.risk = analyze_pattern(pattern)
+        if self.risk is None and self.sandbox:
+            self.risk = "slow inline search"
+        self.version = next(_VERSIONS)
+
+    def demote(self) -> None:
+        """Run this trigger in the regex sandbox from now on"""
+        self.sandbox = True
+        if self.risk is None:
+            self.risk = "slow inline search"
+
     def enable(self):
         """Explicitly enable this trigger"""
         self.enabled = True
@@ -207,9 +253,9 @@ class Trigger:
             "count": self.count,
             "image": self.image,
             "text": self.text,
-            "whitelist": self.whitelist,
-            "blacklist": self.blacklist,
-            "cooldown": self.cooldown,
+            "whitelist": sorted(self.whitelist),
+            "blacklist": sorted(self.blacklist),
+            "cooldown": self.cooldown.to_json() if self.cooldown else {},
             "multi_payload": self.multi_payload,
             "created_at": self.created_at,
             "ignore_commands": self.ignore_commands,
@@ -218,6 +264,7 @@ class Trigger:
             "delete_after": self.delete_after,
             "read_filenames": self.read_filenames,
             "chance": self.chance,
+            "sandbox": self.sandbox,
         }
 
     @classmethod
@@ -232,6 +279,7 @@ class Trigger:
         enabled = True
         read_filenames = True
         chance = 0
+        sandbox = False
         if "cooldown" in data:
             cooldown = data["cooldown"]
         if type(data["response_type"]) is str:
@@ -260,6 +308,8 @@ class Trigger:
             data["text"] = ""
         if "chance" in data:
             chance = data["chance"]
+        if "sandbox" in data:
+            sandbox = data["sandbox"]
         return cls(
             data["name"],
             data["regex"],
@@ -280,6 +330,7 @@ class Trigger:
             ocr_search=ocr_search,
             read_filenames=read_filenames,
             chance=chance,
+            sandbox=sandbox,
         )
 
 
@@ -287,11 +338,15 @@ class TriggerExists(Converter):
     async def convert(self, ctx: commands.Context, argument: str) -> Union[Trigger, str]:
         bot = ctx.bot
         guild = ctx.guild
-        config = bot.get_cog("ReTrigger").config
-        trigger_list = await config.guild(guild).trigger_list()
+        cog = bot.get_cog("ReTrigger")
+        trigger_list = await cog.config.guild(guild).trigger_list()
         result = None
         if argument in trigger_list:
             result = await Trigger.from_json(trigger_list[argument])
+            cached = cog.triggers[guild.id].get(argument) if guild.id in cog.triggers else None
+            if cached is not None:
+                # the saved count can be behind until the next save
+                result.count = cached.count
         else:
             result = argument
         return result
@@ -308,12 +363,19 @@ class ValidRegex(Converter):
 
     async def convert(self, ctx: commands.Context, argument: str) -> str:
         try:
-            re.compile(argument)
+            pattern = re.compile(argument)
             result = argument
         except Exception as e:
             log.error("Retrigger conversion error")
             err_msg = _("`{arg}` is not a valid regex pattern. {e}").format(arg=argument, e=e)
             raise BadArgument(err_msg)
+        risk = analyze_pattern(pattern)
+        if risk is not None:
+            msg = _(
+                "This pattern can be slow to search ({risk}) "
+                "so it will be searched in the regex sandbox."
+            )
+            await ctx.send(msg.format(risk=risk))
         return result
 
 
@@ -0,0 +1,83 @@
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+GUILD_STYLES = ("guild", "server")
+
+
+class Cooldown:
+    """
+    Tracks when a trigger last ran per guild, channel or author
+
+    Per channel and per author cooldowns keep a dict of snowflake to the
+    timestamp it last ran along with a min-heap of `(expires, snowflake)`.
+    Expired entries are popped off the heap whenever the cooldown is checked
+    so a check is O(1) amortised and only entities still on cooldown are
+    kept in memory or saved.
+    """
+
+    def __init__(self, time: float, style: str, last: float = 0):
+        self.time = time
+        self.style = style
+        # only used for guild cooldowns
+        self.last = last
+        self.entities: Dict[int, float] = {}
+        self._expiry: List[Tuple[float, int]] = []
+
+    @property
+    def per_guild(self) -> bool:
+        return self.style in GUILD_STYLES
+
+    def _evict(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] < now:
+            __, snowflake = heapq.heappop(self._expiry)
+            self.entities.pop(snowflake, None)
+
+    def _add(self, snowflake: int, last: float) -> None:
+        self.entities[snowflake] = last
+        heapq.heappush(self._expiry, (last + self.time, snowflake))
+
+    def update(self, snowflake: Optional[int], now: Optional[float] = None) -> bool:
+        """
+        Returns True if the trigger is still on cooldown for `snowflake`
+
+        Otherwise the cooldown is restarted from `now` and False is returned.
+        `snowflake` is ignored for guild cooldowns.
+        """
+        if now is None:
+            now = time.time()
+        if self.per_guild:
+            if (now - self.last) > self.time:
+                self.last = now
+                return False
+            return True
+        self._evict(now)
+        if snowflake in self.entities:
+            return True
+        self._add(snowflake, now)
+        return False
+
+    def to_json(self) -> dict:
+        if self.per_guild:
+            return {"time": self.time, "style": self.style, "last": self.last}
+        self._evict(time.time())
+        return {
+            "time": self.time,
+            "style": self.style,
+            "last": [[snowflake, last] for snowflake, last in self.entities.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Cooldown":
+        last = data.get("last", 0)
+        if data["style"] in GUILD_STYLES:
+            return cls(data["time"], data["style"], last or 0)
+        cooldown = cls(data["time"], data["style"])
+        for entity in last or []:
+            if isinstance(entity, dict):
+                # older versions saved a list of {"id": snowflake, "last": timestamp}
+                cooldown._add(entity["id"], entity["last"])
+            else:
+                cooldown._add(*entity)
+        cooldown._evict(time.time())
+        return cooldown
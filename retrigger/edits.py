@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import discord
+from redbot.core.bot import Red
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+# edits to the same message inside this many seconds are only checked once
+EDIT_WINDOW = 1.0
+# most fetch_message calls made per second when an edit payload is incomplete
+FETCHES_PER_SECOND = 2
+# fields we need from the payload to skip fetching the message
+REQUIRED_FIELDS = ("id", "channel_id", "content", "author", "attachments", "embeds")
+# defaults for fields discord.Message expects but edit payloads can leave out
+PAYLOAD_DEFAULTS = {
+    "type": 0,
+    "pinned": False,
+    "mention_everyone": False,
+    "tts": False,
+    "edited_timestamp": None,
+    "mentions": [],
+    "mention_roles": [],
+}
+
+
+def message_from_payload(
+    state, channel: discord.TextChannel, data: dict
+) -> Optional[discord.Message]:
+    """
+    Build a message from the data in a raw edit event
+
+    Returns None if the payload is missing anything we need to check
+    triggers in which case the message has to be fetched.
+    """
+    if any(field not in data for field in REQUIRED_FIELDS):
+        return None
+    try:
+        message = discord.Message(state=state, channel=channel, data={**PAYLOAD_DEFAULTS, **data})
+    except (KeyError, TypeError, ValueError):
+        log.debug("Could not build a message from an edit payload", exc_info=True)
+        return None
+    if not isinstance(message.author, discord.Member):
+        member = channel.guild.get_member(message.author.id)
+        if member is None:
+            return None
+        message.author = member
+    return message
+
+
+class EditQueue:
+    """
+    Coalesces message edits before they're checked for triggers
+
+    The first edit of a message starts a short window, later edits in that
+    window only replace the pending payload so the message is checked once
+    with its latest content. Messages are built from the payload when it has
+    everything we need and only fetched otherwise. Fetches for the same
+    message are shared and spaced out to `FETCHES_PER_SECOND`.
+    """
+
+    def __init__(self, bot: Red, callback: Callable[[discord.Message], Awaitable[None]]):
+        self.bot = bot
+        self.callback = callback
+        self.pending: Dict[int, dict] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._fetches: Dict[int, asyncio.Task] = {}
+        self._next_fetch = 0.0
+
+    def add(self, data: dict) -> None:
+        message_id = int(data["id"])
+        if message_id in self.pending:
+            self.pending[message_id] = data
+            return
+        self.pending[message_id] = data
+        task = asyncio.create_task(self._process(message_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, message_id: int) -> None:
+        await asyncio.sleep(EDIT_WINDOW)
+        data = self.pending.pop(message_id)
+        channel = self.bot.get_channel(int(data["channel_id"]))
+        if channel is None:
+            return
+        message = message_from_payload(self.bot._connection, channel, data)
+        if message is None:
+            message = await self.fetch(channel, message_id)
+        if message is None:
+            return
+        try:
+            await self.callback(message)
+        except Exception:
+            log.error("Error checking triggers on an edited message", exc_info=True)
+
+    async def fetch(
+        self, channel: discord.TextChannel, message_id: int
+    ) -> Optional[discord.Message]:
+        task = self._fetches.get(message_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(channel, message_id))
+            self._fetches[message_id] = task
+            task.add_done_callback(lambda t: self._fetches.pop(message_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, channel: discord.TextChannel, message_id: int
+    ) -> Optional[discord.Message]:
+        now = time.monotonic()
+        delay = self._next_fetch - now
+        self._next_fetch = max(now, self._next_fetch) + 1 / FETCHES_PER_SECOND
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            return await channel.fetch_message(message_id)
+        except (discord.errors.Forbidden, discord.errors.NotFound):
+            log.debug(
+                "I don't have permission to read channel history or cannot find the message."
+            )
+        except Exception:
+            log.info("Could not find channel or message", exc_info=True)
+        return None
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self.pending.clear()
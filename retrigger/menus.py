@@ -186,8 +186,8 @@ class ReTriggerPages(menus.ListPageSource):
         if blacklist_s:
             info += _("__Blocklist__: ") + blacklist_s + "\n"
         if trigger.cooldown:
-            time = trigger.cooldown["time"]
-            style = trigger.cooldown["style"]
+            time = trigger.cooldown.time
+            style = trigger.cooldown.style
             info += _("Cooldown: ") + "**{}s per {}**\n".format(time, style)
         if trigger.ocr_search:
             info += _("OCR: **Enabled**\n")
@@ -199,6 +199,10 @@ class ReTriggerPages(menus.ListPageSource):
             info += _("Read filenames: **Enabled**\n")
         if trigger.chance:
             info += _("__Chance__: **1 in {number}**\n").format(number=trigger.chance)
+        if trigger.risk is None:
+            info += _("__Search__: **Inline**\n")
+        else:
+            info += _("__Search__: **Sandboxed** ({reason})\n").format(reason=trigger.risk)
         if embeds:
             # info += _("__Regex__: ") + box(trigger.regex.pattern, lang="bf")
             em = discord.Embed(
@@ -426,9 +430,7 @@ class ReTriggerMenu(menus.MenuPages, inherit_buttons=False):
                     await self.message.edit(
                         content=_("This trigger has been deleted."), embed=kwargs["embed"]
                     )
-                    for t in self.cog.triggers[self.ctx.guild.id]:
-                        if t.name == self.source.selection.name:
-                            self.cog.triggers[self.ctx.guild.id].remove(t)
+                    self.cog.triggers[self.ctx.guild.id].remove(self.source.selection.name)
 
 
 class BaseMenu(menus.MenuPages, inherit_buttons=False):
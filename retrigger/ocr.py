@@ -0,0 +1,171 @@
+import asyncio
+import functools
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+import discord
+
+from .cache import DiskCache, LRUCache
+
+try:
+    from PIL import Image
+    import pytesseract
+
+    ALLOW_OCR = True
+except ImportError:
+    ALLOW_OCR = False
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+# images are shrunk to fit inside this many pixels before OCR
+MAX_DIMENSION = 1600
+# largest image in bytes we'll download or read from an attachment
+MAX_DOWNLOAD = 8 * 1024 * 1024
+OCR_PROCESSES = 2
+OCR_TIMEOUT = 5
+MEMORY_CACHE_SIZE = 512
+DISK_CACHE_SIZE = 10000
+
+
+def image_to_string(data: bytes) -> str:
+    """Runs inside the OCR process pool"""
+    with Image.open(BytesIO(data)) as im:
+        # thumbnail keeps the aspect ratio and never enlarges
+        im.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+        return pytesseract.image_to_string(im)
+
+
+class OCRReader:
+    """
+    Reads text from images for OCR triggers
+
+    Results are cached by a hash of the image so the same image is only read
+    once no matter how many times it's posted, images OCR fails on are cached
+    as having no text. The cache lives in memory and optionally on disk under
+    `cache_dir` so it survives a reload, disk reads and writes run in the
+    default executor. OCR runs on a small dedicated process pool and downloads
+    share one session with a size limit.
+    """
+
+    def __init__(self, cache_dir: Path, processes: int = OCR_PROCESSES):
+        self.processes = processes
+        self.memory = LRUCache(MEMORY_CACHE_SIZE)
+        self.disk = DiskCache(cache_dir, DISK_CACHE_SIZE)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor) -> None:
+        # a worker died, a broken pool refuses every job so start a new one next time
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False)
+
+    async def _image_to_string(self, data: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(pool, image_to_string, data)
+        except BrokenProcessPool:
+            log.warning("The OCR process pool broke, retrying in a new one")
+            self._reset_pool(pool)
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(pool, image_to_string, data)
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def read(self, data: bytes) -> str:
+        """Returns the text in an image running OCR only if it hasn't been seen before"""
+        key = hashlib.sha256(data).hexdigest()
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(key)
+        if future is None and self.disk.enabled:
+            cached = await loop.run_in_executor(None, self.disk.get, key)
+            if cached is not None:
+                text = cached.decode("utf-8")
+                self.memory.set(key, text)
+                return text
+            # another read of this image may have started while we checked the disk
+            future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._image_to_string(data))
+            self._pending[key] = future
+            # cache the result even if everyone waiting on it timed out
+            future.add_done_callback(functools.partial(self._store, key))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=OCR_TIMEOUT)
+        except asyncio.TimeoutError:
+            return ""
+        except Exception:
+            log.error("Error reading text from an image", exc_info=True)
+            return ""
+
+    def _store(self, key: str, future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # don't read a broken image again, only in memory so it's retried after a reload
+            self.memory.set(key, "")
+            return
+        text = future.result()
+        self.memory.set(key, text)
+        if self.disk.enabled:
+            asyncio.get_running_loop().run_in_executor(
+                None, self.disk.set, key, text.encode("utf-8")
+            )
+
+    async def read_attachment(self, attachment: discord.Attachment) -> str:
+        if attachment.size > MAX_DOWNLOAD:
+            return ""
+        try:
+            data = await attachment.read()
+        except discord.HTTPException:
+            return ""
+        return await self.read(data)
+
+    async def read_url(self, url: str) -> str:
+        try:
+            async with self.session.get(url) as resp:
+                if resp.status != 200:
+                    # don't read an error page as the image
+                    return ""
+                if resp.content_length and resp.content_length > MAX_DOWNLOAD:
+                    return ""
+                data = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    data.extend(chunk)
+                    if len(data) > MAX_DOWNLOAD:
+                        return ""
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return ""
+        return await self.read(bytes(data))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,184 @@
+import logging
+import warnings
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse  # type: ignore
+
+try:
+    import ahocorasick
+
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+LITERAL = sre_parse.LITERAL
+SUBPATTERN = sre_parse.SUBPATTERN
+BRANCH = sre_parse.BRANCH
+REPEATS = tuple(
+    getattr(sre_parse, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, op)
+)
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+
+SRE_FLAG_IGNORECASE = 2
+SRE_FLAG_VERBOSE = 64
+
+# casefold() covers every case-insensitive equivalence the re module knows about
+# except for the dotless i and the dotted capital I, which casefolds to two
+# characters while re matches it as a plain i. Fold those by hand before casefold().
+_FOLD_FIXES = {0x130: "i", 0x131: "i"}
+
+
+def normalize(content: str) -> str:
+    """Fold text the same way the literals are folded so a substring check is safe
+    for both case-sensitive and case-insensitive patterns."""
+    return content.translate(_FOLD_FIXES).casefold()
+
+
+def _score(literals: FrozenSet[str]) -> Tuple[int, int]:
+    return (min(len(lit) for lit in literals), -len(literals))
+
+
+def _flatten(items: Iterable, ignorecase: bool):
+    """Inline groups so literals on either side of a group boundary join up"""
+    for op, av in items:
+        if op is SUBPATTERN:
+            add_flags, del_flags = av[1], av[2]
+            sub_ignorecase = ignorecase
+            if add_flags & SRE_FLAG_IGNORECASE:
+                sub_ignorecase = True
+            if del_flags & SRE_FLAG_IGNORECASE:
+                sub_ignorecase = False
+            yield from _flatten(av[-1], sub_ignorecase)
+        else:
+            yield op, av, ignorecase
+
+
+def _required(items: Iterable, ignorecase: bool) -> Optional[FrozenSet[str]]:
+    """
+    Return a set of literals where at least one must appear in any string
+    the items can match, or None if no such set can be proven.
+    """
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            candidates.append(frozenset([normalize("".join(run))]))
+            run.clear()
+
+    for op, av, case in _flatten(items, ignorecase):
+        if op is LITERAL:
+            char = chr(av)
+            if case and not char.isascii():
+                # folding rules outside ascii differ between re and regex
+                flush()
+                continue
+            run.append(char)
+        elif op is BRANCH:
+            flush()
+            alternatives: List[FrozenSet[str]] = []
+            for branch in av[1]:
+                required = _required(branch, case)
+                if required is None:
+                    alternatives = []
+                    break
+                alternatives.append(required)
+            if alternatives:
+                candidates.append(frozenset().union(*alternatives))
+        elif op in REPEATS:
+            low, high, sub = av
+            sub = list(sub)
+            if low >= 1 and len(sub) == 1 and sub[0][0] is LITERAL:
+                char = chr(sub[0][1])
+                if not (case and not char.isascii()):
+                    # `ab{2,}c` always contains both `abb` and `bbc`
+                    run.extend(char * low)
+                    if low != high:
+                        flush()
+                        run.extend(char * low)
+                    continue
+            flush()
+            if low >= 1:
+                required = _required(sub, case)
+                if required is not None:
+                    candidates.append(required)
+        elif ATOMIC_GROUP is not None and op is ATOMIC_GROUP:
+            flush()
+            required = _required(av, case)
+            if required is not None:
+                candidates.append(required)
+        else:
+            # anything else (classes, anchors, lookarounds, backreferences)
+            # can't be expressed as a literal so it ends the current run
+            flush()
+    flush()
+    candidates = [c for c in candidates if all(c)]
+    if not candidates:
+        return None
+    return max(candidates, key=_score)
+
+
+def extract_literals(regex: Pattern) -> Optional[FrozenSet[str]]:
+    """
+    Pull out the literal substrings one of which must appear in the text
+    for the pattern to match.
+
+    Returns None when no literal can be proven, this includes any pattern
+    using syntax only the regex module understands.
+    """
+    try:
+        with warnings.catch_warnings():
+            # nested set warnings mean the regex module would read this differently
+            warnings.simplefilter("error")
+            parsed = sre_parse.parse(regex.pattern, regex.flags & SRE_FLAG_VERBOSE)
+    except Exception:
+        return None
+    return _required(parsed, bool(regex.flags & SRE_FLAG_IGNORECASE))
+
+
+class TriggerPrefilter:
+    """
+    Per guild index of trigger literals
+
+    The message is scanned once for every literal in the guild and only
+    triggers whose literals are found, or which have no literals at all,
+    are passed on to the full regex search.
+    """
+
+    def __init__(self, triggers: Iterable, version: int):
+        self.version = version
+        self.always: Set[str] = set()
+        self.by_literal: Dict[str, Set[str]] = {}
+        for trigger in triggers:
+            if trigger.literals is None or trigger.ocr_search:
+                # OCR text isn't known until the image is read
+                self.always.add(trigger.name)
+                continue
+            for literal in trigger.literals:
+                self.by_literal.setdefault(literal, set()).add(trigger.name)
+        self.automaton = None
+        if HAS_AHOCORASICK and self.by_literal:
+            self.automaton = ahocorasick.Automaton()
+            for literal in self.by_literal:
+                self.automaton.add_word(literal, literal)
+            self.automaton.make_automaton()
+
+    def candidates(self, content: str) -> Set[str]:
+        """Returns the names of the triggers worth running against the content"""
+        folded = normalize(content)
+        result = set(self.always)
+        if self.automaton is not None:
+            for __, literal in self.automaton.iter(folded):
+                result.update(self.by_literal[literal])
+        else:
+            for literal, names in self.by_literal.items():
+                if literal in folded:
+                    result.update(names)
+        return result
@@ -0,0 +1,124 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# upper bound of each bucket in milliseconds, anything slower lands in the last bucket
+BUCKETS: Tuple[float, ...] = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+)
+STAGES = ("regex", "ocr", "action")
+# images are read once per message for every OCR trigger so OCR is timed for the guild
+OCR_BUCKET = "<ocr>"
+
+
+class Histogram:
+    """
+    Fixed bucket latency histogram
+
+    Percentiles are reported as the upper bound of the bucket they fall in
+    so they're accurate to the bucket size and cost nothing to keep.
+    """
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+    def to_json(self) -> dict:
+        return {
+            "buckets": list(BUCKETS),
+            "counts": self.counts,
+            "count": self.count,
+            "total_ms": self.total,
+            "max_ms": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class TriggerProfiler:
+    """
+    In memory timings for every trigger split into regex, OCR and action time
+
+    OCR is shared by every trigger searching a message's images so it's
+    recorded once under `OCR_BUCKET` instead of under any one trigger.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, Dict[str, Dict[str, Histogram]]] = {}
+
+    def record(self, guild_id: int, name: str, stage: str, seconds: float) -> None:
+        trigger = self.guilds.setdefault(guild_id, {}).setdefault(name, {})
+        if stage not in trigger:
+            trigger[stage] = Histogram()
+        trigger[stage].record(seconds * 1000)
+
+    @contextmanager
+    def timer(self, guild_id: int, name: str, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(guild_id, name, stage, time.perf_counter() - start)
+
+    def slowest(self, guild_id: int, number: int = 10) -> List[Tuple[str, Dict[str, Histogram]]]:
+        """Triggers in the guild ordered by the sum of their p95 times across stages"""
+        triggers = self.guilds.get(guild_id, {})
+        ranked = sorted(
+            triggers.items(),
+            key=lambda item: sum(h.percentile(95) for h in item[1].values()),
+            reverse=True,
+        )
+        return ranked[:number]
+
+    def to_json(self, guild_id: Optional[int] = None) -> dict:
+        guilds = self.guilds if guild_id is None else {guild_id: self.guilds.get(guild_id, {})}
+        return {
+            str(g_id): {
+                name: {stage: histogram.to_json() for stage, histogram in stages.items()}
+                for name, stages in triggers.items()
+            }
+            for g_id, triggers in guilds.items()
+        }
+
+    def remove(self, guild_id: int, name: str) -> None:
+        self.guilds.get(guild_id, {}).pop(name, None)
+
+    def reset(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
@@ -0,0 +1,59 @@
+import itertools
+from typing import Dict, Iterator, Optional, Tuple
+
+from .converters import Trigger
+
+# shared between guilds so a replaced registry never reuses an old version
+_VERSIONS = itertools.count(1)
+
+
+class TriggerRegistry:
+    """
+    Ordered collection of a guild's triggers keyed by name
+
+    Adding a trigger with a name that already exists replaces it in place
+    so it keeps its position and can never be listed twice. `version`
+    changes on every add or remove so anything built from the triggers,
+    like the prefilter or scope index, knows when to rebuild.
+    """
+
+    def __init__(self):
+        self._triggers: Dict[str, Trigger] = {}
+        self._ordered: Optional[Tuple[Trigger, ...]] = None
+        self.version = next(_VERSIONS)
+
+    def _changed(self) -> None:
+        self._ordered = None
+        self.version = next(_VERSIONS)
+
+    def add(self, trigger: Trigger) -> None:
+        old = self._triggers.get(trigger.name)
+        if old is not None and old.sandbox and old.regex.pattern == trigger.regex.pattern:
+            # a copy loaded before the pattern was demoted shouldn't undo it
+            trigger.demote()
+        self._triggers[trigger.name] = trigger
+        self._changed()
+
+    def remove(self, name: str) -> Optional[Trigger]:
+        trigger = self._triggers.pop(name, None)
+        if trigger is not None:
+            self._changed()
+        return trigger
+
+    def get(self, name: str) -> Optional[Trigger]:
+        return self._triggers.get(name)
+
+    def index(self, name: str) -> int:
+        return list(self._triggers).index(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._triggers
+
+    def __iter__(self) -> Iterator[Trigger]:
+        # iterate a snapshot so triggers can be edited while a message is checked
+        if self._ordered is None:
+            self._ordered = tuple(self._triggers.values())
+        return iter(self._ordered)
+
+    def __len__(self) -> int:
+        return len(self._triggers)
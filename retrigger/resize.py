@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .cache import DiskCache, LRUCache
+
+try:
+    from PIL import Image, ImageSequence
+
+    ALLOW_RESIZE = True
+except ImportError:
+    ALLOW_RESIZE = False
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+# resized images are multiples of this many pixels on their longest side
+STEP = 16
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+DISK_CACHE_SIZE = 2000
+RESIZE_TIMEOUT = 60
+# sizes generated up front when a resize trigger is created
+WARM_SIZES = range(1, 11)
+
+
+def resize_image(size: int, image: str) -> bytes:
+    length, width = (STEP, STEP)  # Start with the smallest size we want to upload
+    with Image.open(image) as im:
+        im.thumbnail((length * size, width * size), Image.ANTIALIAS)
+        byte_array = BytesIO()
+        im.save(byte_array, format="PNG")
+        return byte_array.getvalue()
+
+
+def resize_gif(size: int, image: str) -> bytes:
+    img_list = []
+    with Image.open(image) as im:
+        length, width = (STEP * size, STEP * size)
+        start_list = [frame.copy() for frame in ImageSequence.Iterator(im)]
+        for frame in start_list:
+            frame.thumbnail((length, width), Image.ANTIALIAS)
+            img_list.append(frame)
+    byte_array = BytesIO()
+    img_list[0].save(
+        byte_array, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
+    )
+    return byte_array.getvalue()
+
+
+def largest_size(image: str) -> int:
+    """The size past which resizing no longer changes the image"""
+    with Image.open(image) as im:
+        return max(math.ceil(max(im.size) / STEP), 1)
+
+
+class ResizeCache:
+    """
+    Cache of resized trigger images
+
+    Variants are keyed by `(path, size, mtime)` so replacing an image on disk
+    invalidates every variant of it. Resized bytes are kept in a memory LRU
+    limited by total size and optionally on disk under `cache_dir`. Sizes
+    beyond the image's own size produce the same output so they share one
+    entry.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.memory = LRUCache(MEMORY_CACHE_BYTES, weigh=len)
+        self.largest = LRUCache(1024)
+        self.disk = DiskCache(cache_dir, DISK_CACHE_SIZE)
+
+    async def get(self, image: str, size: int) -> Optional[bytes]:
+        """Returns the image resized for `size` or None if it couldn't be made in time"""
+        loop = asyncio.get_running_loop()
+        try:
+            mtime = os.stat(image).st_mtime_ns
+        except OSError:
+            log.error("Resize image %s is missing", image)
+            return None
+        largest = self.largest.get((image, mtime))
+        if largest is None:
+            largest = await loop.run_in_executor(None, largest_size, image)
+            self.largest.set((image, mtime), largest)
+        size = min(max(size, 1), largest)
+        key = (image, size, mtime)
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+        ext = ".gif" if image.lower().endswith(".gif") else ".png"
+        disk_key = "{}-{}-{}{}".format(
+            hashlib.sha1(image.encode("utf-8")).hexdigest(), size, mtime, ext
+        )
+        data = None
+        if self.disk.enabled:
+            data = await loop.run_in_executor(None, self.disk.get, disk_key)
+        if data is None:
+            task = resize_gif if ext == ".gif" else resize_image
+            try:
+                data = await asyncio.wait_for(
+                    loop.run_in_executor(None, task, size, image), timeout=RESIZE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return None
+            if self.disk.enabled:
+                loop.run_in_executor(None, self.disk.set, disk_key, data)
+        self.memory.set(key, data)
+        return data
+
+    async def warm(self, image: str, sizes: Iterable[int] = WARM_SIZES) -> None:
+        """Generate the common sizes of a new resize trigger ahead of time"""
+        for size in sizes:
+            try:
+                await self.get(image, size)
+            except Exception:
+                log.error("Error resizing %s", image, exc_info=True)
+                return
@@ -1,19 +1,22 @@
 import asyncio
+import json
 import logging
-from multiprocessing.pool import Pool
+from io import BytesIO
 from pathlib import Path
 from typing import Optional, Union
 
 import discord
 from redbot.core import Config, VersionInfo, checks, commands, modlog, version_info
 from redbot.core.commands import TimedeltaConverter
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
 
 # from redbot.core.utils import menus
-from redbot.core.utils.chat_formatting import humanize_list, pagify
+from redbot.core.utils.chat_formatting import box, humanize_list, pagify
 from redbot.core.utils.menus import start_adding_reactions
 from redbot.core.utils.predicates import ReactionPredicate
 
+from .cache import TTLCache
 from .converters import (
     ChannelUserRole,
     MultiResponse,
@@ -22,8 +25,15 @@ from .converters import (
     ValidEmoji,
     ValidRegex,
 )
+from .cooldown import Cooldown
+from .edits import EditQueue
 from .menus import BaseMenu, ExplainReTriggerPages, ReTriggerMenu, ReTriggerPages
-from .triggerhandler import TriggerHandler
+from .ocr import OCRReader
+from .profiling import STAGES, TriggerProfiler
+from .registry import TriggerRegistry
+from .resize import ResizeCache
+from .sandbox import PatternPool
+from .triggerhandler import MOD_TTL, PREFIX_TTL, TriggerHandler
 
 log = logging.getLogger("red.trusty-cogs.ReTrigger")
 _ = Translator("ReTrigger", __file__)
@@ -62,12 +72,24 @@ class ReTrigger(TriggerHandler, commands.Cog):
             "bypass": False,
         }
         self.config.register_guild(**default_guild)
-        self.config.register_global(trigger_timeout=1)
-        self.re_pool = Pool(maxtasksperchild=1000)
+        self.config.register_global(
+            trigger_timeout=1, batch_search=True, ocr_disk_cache=False, resize_disk_cache=False
+        )
+        self.re_pool = PatternPool()
+        self.ocr_reader = OCRReader(cog_data_path(self) / "ocr_cache")
+        self.resize_cache = ResizeCache(cog_data_path(self) / "resize_cache")
+        self.edit_queue = EditQueue(bot, self.check_edited_message)
+        self.prefix_cache = TTLCache(1024, PREFIX_TTL)
+        self.mod_cache = TTLCache(10000, MOD_TTL)
+        self.profiler = TriggerProfiler()
         self.triggers = {}
+        self.prefilters = {}
+        self.scopes = {}
+        self.dirty_counts = {}
         self.save_triggers = None
         self.__unload = self.cog_unload
         self.trigger_timeout = 1
+        self.batch_search = True
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -81,12 +103,18 @@ class ReTrigger(TriggerHandler, commands.Cog):
         self.re_pool.close()
         self.bot.loop.run_in_executor(None, self.re_pool.join)
         self.save_triggers.cancel()
+        self.edit_queue.cancel()
+        self.bot.loop.create_task(self.save_counts())
+        self.bot.loop.create_task(self.ocr_reader.close())
 
     async def initialize(self):
         self.trigger_timeout = await self.config.trigger_timeout()
+        self.batch_search = await self.config.batch_search()
+        self.ocr_reader.disk.enabled = await self.config.ocr_disk_cache()
+        self.resize_cache.disk.enabled = await self.config.resize_disk_cache()
         data = await self.config.all_guilds()
         for guild, settings in data.items():
-            self.triggers[guild] = []
+            self.triggers[guild] = TriggerRegistry()
             for trigger in settings["trigger_list"].values():
                 try:
                     new_trigger = await Trigger.from_json(trigger)
@@ -94,7 +122,10 @@ class ReTrigger(TriggerHandler, commands.Cog):
                     log.exception("Error trying to compile regex pattern.")
                     # I might move this to DM the author of the trigger
                     # before this becomes actually breaking
-                self.triggers[guild].append(new_trigger)
+                self.triggers[guild].add(new_trigger)
+            # patterns that passed analysis run inline and never need the pool
+            sandboxed = [t for t in self.triggers[guild] if t.risk is not None]
+            await self.re_pool.preload(guild, sandboxed)
         self.save_triggers = asyncio.create_task(self.save_loop())
 
     async def save_loop(self):
@@ -103,19 +134,32 @@ class ReTrigger(TriggerHandler, commands.Cog):
         else:
             await self.bot.wait_until_ready()
         while self is self.bot.get_cog("ReTrigger"):
-            for guild_id, triggers in self.triggers.items():
-                guild = self.bot.get_guild(guild_id)
-                if not guild:
-                    continue
-                async with self.config.guild(guild).trigger_list() as trigger_list:
-                    for trigger in triggers:
-                        try:
-                            trigger_list[trigger.name]["count"] = trigger.count
-                        except KeyError:
-                            continue
-                        await asyncio.sleep(0.1)
+            await self.save_counts()
             await asyncio.sleep(120)
 
+    async def save_counts(self) -> None:
+        """
+        Write the counts of triggers that have fired since the last save
+
+        Each guild with changes gets a single write covering only its dirty triggers.
+        """
+        dirty, self.dirty_counts = self.dirty_counts, {}
+        for guild_id, names in dirty.items():
+            triggers = self.triggers.get(guild_id)
+            if triggers is None:
+                continue
+            try:
+                async with self.config.guild_from_id(guild_id).trigger_list() as trigger_list:
+                    for name in names:
+                        trigger = triggers.get(name)
+                        if trigger is None or name not in trigger_list:
+                            continue
+                        trigger_list[name]["count"] = trigger.count
+            except Exception:
+                log.exception("Error saving trigger counts in %s", guild_id)
+                # try again on the next save
+                self.dirty_counts.setdefault(guild_id, set()).update(names)
+
     @commands.group()
     @commands.guild_only()
     async def retrigger(self, ctx: commands.Context) -> None:
@@ -378,18 +422,14 @@ class ReTrigger(TriggerHandler, commands.Cog):
         msg = _("Cooldown of {time}s per {style} set for Trigger `{name}`.")
         if style in ["user", "member"]:
             style = "author"
-        if style in ["guild", "server"]:
-            cooldown = {"time": time, "style": style, "last": 0}
-        else:
-            cooldown = {"time": time, "style": style, "last": []}
+        cooldown: Optional[Cooldown] = Cooldown(time, style)
         if time <= 0:
-            cooldown = {}
+            cooldown = None
             msg = _("Cooldown for Trigger `{name}` reset.")
         trigger_list = await self.config.guild(ctx.guild).trigger_list()
         trigger.cooldown = cooldown
         trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         await self.config.guild(ctx.guild).trigger_list.set(trigger_list)
         await ctx.send(msg.format(time=time, style=style, name=trigger.name))
 
@@ -418,10 +458,9 @@ class ReTrigger(TriggerHandler, commands.Cog):
         for obj in channel_user_role:
             if obj.id not in trigger.whitelist:
                 async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
-                    trigger.whitelist.append(obj.id)
+                    trigger.whitelist = trigger.whitelist | {obj.id}
                     trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} added `{list_type}` to its allowlist.")
         list_type = humanize_list([c.name for c in channel_user_role])
         await ctx.send(msg.format(list_type=list_type, name=trigger.name))
@@ -454,10 +493,9 @@ class ReTrigger(TriggerHandler, commands.Cog):
         for obj in channel_user_role:
             if obj.id in trigger.whitelist:
                 async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
-                    trigger.whitelist.remove(obj.id)
+                    trigger.whitelist = trigger.whitelist - {obj.id}
                     trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} removed `{list_type}` from its allowlist.")
         list_type = humanize_list([c.name for c in channel_user_role])
         await ctx.send(msg.format(list_type=list_type, name=trigger.name))
@@ -487,10 +525,9 @@ class ReTrigger(TriggerHandler, commands.Cog):
         for obj in channel_user_role:
             if obj.id not in trigger.blacklist:
                 async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
-                    trigger.blacklist.append(obj.id)
+                    trigger.blacklist = trigger.blacklist | {obj.id}
                     trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} added `{list_type}` to its blocklist.")
         list_type = humanize_list([c.name for c in channel_user_role])
         await ctx.send(msg.format(list_type=list_type, name=trigger.name))
@@ -523,10 +560,9 @@ class ReTrigger(TriggerHandler, commands.Cog):
         for obj in channel_user_role:
             if obj.id in trigger.blacklist:
                 async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
-                    trigger.blacklist.remove(obj.id)
+                    trigger.blacklist = trigger.blacklist - {obj.id}
                     trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} removed `{list_type}` from its blocklist.")
         list_type = humanize_list([c.name for c in channel_user_role])
         await ctx.send(msg.format(list_type=list_type, name=trigger.name))
@@ -553,8 +589,9 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.regex = re.compile(regex)
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
+        if trigger.risk is not None:
+            await self.re_pool.preload(ctx.guild.id, [trigger])
         msg = _("Trigger {name} regex changed to ```bf\n{regex}\n```")
         await ctx.send(msg.format(name=trigger.name, regex=regex))
 
@@ -577,8 +614,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.ocr_search = not trigger.ocr_search
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} OCR Search set to: {ocr_search}")
         await ctx.send(msg.format(name=trigger.name, ocr_search=trigger.ocr_search))
 
@@ -604,8 +640,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.read_filenames = not trigger.read_filenames
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} read filenames set to: {read_filenames}")
         await ctx.send(msg.format(name=trigger.name, read_filenames=trigger.read_filenames))
 
@@ -629,8 +664,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.ignore_edits = not trigger.ignore_edits
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} ignore edits set to: {ignore_edits}")
         await ctx.send(msg.format(name=trigger.name, ignore_edits=trigger.ignore_edits))
 
@@ -658,8 +692,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.text = text
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} text changed to `{text}`")
         await ctx.send(msg.format(name=trigger.name, text=text))
 
@@ -689,8 +722,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.chance = chance
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         if chance:
             msg = _("Trigger {name} chance changed to `1 in {chance}`")
         else:
@@ -735,8 +767,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.delete_after = delete_after_seconds
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} will now delete after `{time}` seconds.")
         await ctx.send(msg.format(name=trigger.name, time=delete_after_seconds))
 
@@ -759,8 +790,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.ignore_commands = not trigger.ignore_commands
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} ignoring commands set to `{text}`")
         await ctx.send(msg.format(name=trigger.name, text=trigger.ignore_commands))
 
@@ -795,8 +825,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.text = command
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} command changed to `{command}`")
         await ctx.send(msg.format(name=trigger.name, command=command))
 
@@ -836,8 +865,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.text = role_ids
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} role edits changed to `{roles}`")
         await ctx.send(msg.format(name=trigger.name, roles=humanize_list([r.name for r in roles])))
 
@@ -865,8 +893,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.text = emojis
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} reactions changed to {emojis}")
         emoji_s = [f"<{e}>" for e in emojis if len(e) > 5] + [e for e in emojis if len(e) < 5]
         await ctx.send(msg.format(name=trigger.name, emojis=humanize_list(emoji_s)))
@@ -888,8 +915,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.enabled = True
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
-        await self.remove_trigger_from_cache(ctx.guild.id, trigger)
-        self.triggers[ctx.guild.id].append(trigger)
+        self.triggers[ctx.guild.id].add(trigger)
         msg = _("Trigger {name} has been enabled.")
         await ctx.send(msg.format(name=trigger.name))
 
@@ -910,6 +936,7 @@ class ReTrigger(TriggerHandler, commands.Cog):
         trigger.enabled = False
         async with self.config.guild(ctx.guild).trigger_list() as trigger_list:
             trigger_list[trigger.name] = await trigger.to_json()
+        self.re_pool.unregister(ctx.guild.id, trigger.name)
         await self.remove_trigger_from_cache(ctx.guild.id, trigger)
         msg = _("Trigger {name} has been disabled.")
         await ctx.send(msg.format(name=trigger.name))
@@ -959,6 +986,66 @@ class ReTrigger(TriggerHandler, commands.Cog):
             self.trigger_timeout = timeout
             await ctx.send(_("Regex search timeout set to {timeout}").format(timeout=timeout))
 
+    @retrigger.command(hidden=True)
+    @checks.is_owner()
+    async def batch(self, ctx: commands.Context, batch_search: bool) -> None:
+        """
+        Toggle searching all candidate triggers for a message in a single process
+
+        When enabled every trigger that could respond to a message is searched
+        in one process pool job rather than one job per trigger.
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        await self.config.batch_search.set(batch_search)
+        self.batch_search = batch_search
+        if batch_search:
+            await ctx.send(_("Triggers will now be searched in batches."))
+        else:
+            await ctx.send(_("Triggers will now be searched individually."))
+
+    @retrigger.command(hidden=True)
+    @checks.is_owner()
+    async def ocrcache(self, ctx: commands.Context, disk_cache: bool) -> None:
+        """
+        Toggle saving OCR results to disk
+
+        OCR results are always cached in memory by image. When enabled they are
+        also saved in the cogs data folder so they survive the cog reloading.
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        await self.config.ocr_disk_cache.set(disk_cache)
+        self.ocr_reader.disk.enabled = disk_cache
+        if disk_cache:
+            await ctx.send(_("OCR results will now be saved to disk."))
+        else:
+            await ctx.send(_("OCR results will now only be cached in memory."))
+
+    @retrigger.command(hidden=True)
+    @checks.is_owner()
+    async def resizecache(self, ctx: commands.Context, disk_cache: bool) -> None:
+        """
+        Toggle saving resized images to disk
+
+        Resized images are always cached in memory. When enabled they are also
+        saved in the cogs data folder so they survive the cog reloading.
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        await self.config.resize_disk_cache.set(disk_cache)
+        self.resize_cache.disk.enabled = disk_cache
+        if disk_cache:
+            await ctx.send(_("Resized images will now be saved to disk."))
+        else:
+            await ctx.send(_("Resized images will now only be cached in memory."))
+
     @retrigger.command(hidden=True)
     @checks.is_owner()
     async def bypass(self, ctx: commands.Context, bypass: bool) -> None:
@@ -1027,12 +1114,11 @@ class ReTrigger(TriggerHandler, commands.Cog):
         if trigger:
             if type(trigger) is str:
                 return await ctx.send(_("Trigger `{name}` doesn't exist.").format(name=trigger))
-            for t in self.triggers[guild.id]:
-                if t.name == trigger.name:
-                    index = self.triggers[guild.id].index(t)
+            if trigger.name in self.triggers[guild.id]:
+                index = self.triggers[guild.id].index(trigger.name)
         await ReTriggerMenu(
             source=ReTriggerPages(
-                triggers=self.triggers[guild.id],
+                triggers=list(self.triggers[guild.id]),
                 guild=guild,
             ),
             delete_message_after=False,
@@ -1061,6 +1147,73 @@ class ReTrigger(TriggerHandler, commands.Cog):
         else:
             await ctx.send(_("Trigger `") + str(trigger) + _("` doesn't exist."))
 
+    @retrigger.group(invoke_without_command=True)
+    @checks.mod_or_permissions(manage_messages=True)
+    async def profile(self, ctx: commands.Context, number: Optional[int] = 10) -> None:
+        """
+        Show the slowest triggers on this server
+
+        `[number=10]` how many triggers to show.
+        Times are in milliseconds and split into regex search, OCR
+        and performing the trigger. OCR is shared by every OCR trigger
+        so it's shown once as `<ocr>`. They are reset when the cog reloads.
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        slowest = self.profiler.slowest(ctx.guild.id, number)
+        if not slowest:
+            return await ctx.send(_("No triggers have been timed on this server yet."))
+        header = "{:<20} {:<6} {:>7} {:>7} {:>7} {:>7}\n".format(
+            _("Trigger"), _("Stage"), _("Count"), "p50", "p95", "p99"
+        )
+        msg = ""
+        for name, stages in slowest:
+            for stage in STAGES:
+                histogram = stages.get(stage)
+                if histogram is None:
+                    continue
+                msg += "{:<20} {:<6} {:>7} {:>7g} {:>7g} {:>7g}\n".format(
+                    name[:20],
+                    stage,
+                    histogram.count,
+                    histogram.percentile(50),
+                    histogram.percentile(95),
+                    histogram.percentile(99),
+                )
+        for page in pagify(msg, page_length=1800):
+            await ctx.send(box(header + page, lang="text"))
+
+    @profile.command(name="json")
+    @checks.mod_or_permissions(manage_messages=True)
+    async def profile_json(self, ctx: commands.Context) -> None:
+        """
+        Upload this servers trigger timings as JSON
+
+        Every bucket of each trigger's histograms is included for offline analysis.
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        data = json.dumps(self.profiler.to_json(ctx.guild.id), indent=2)
+        file = discord.File(BytesIO(data.encode("utf-8")), filename=f"profile-{ctx.guild.id}.json")
+        await ctx.send(file=file)
+
+    @profile.command(name="reset")
+    @checks.mod_or_permissions(manage_messages=True)
+    async def profile_reset(self, ctx: commands.Context) -> None:
+        """
+        Clear this servers trigger timings
+
+        See https://regex101.com/ for help building a regex pattern.
+        See `[p]retrigger explain` or click the link below for more details.
+        [For more details click here.](https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/README.md)
+        """
+        self.profiler.reset(ctx.guild.id)
+        await ctx.send(_("Trigger timings reset."))
+
     @retrigger.command()
     async def explain(self, ctx: commands.Context, page_num: Optional[int] = 1) -> None:
         """
@@ -1133,8 +1286,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             delete_after=delete_after_seconds,
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1166,8 +1319,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["randtext"], author, text=text, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1196,8 +1349,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
         author = ctx.message.author.id
         new_trigger = Trigger(name, regex, ["dm"], author, text=text, created_at=ctx.message.id)
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1226,8 +1379,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
         author = ctx.message.author.id
         new_trigger = Trigger(name, regex, ["dmme"], author, text=text, created_at=ctx.message.id)
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1259,8 +1412,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["rename"], author, text=text, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1309,8 +1462,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["image"], author, image=filename, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1343,8 +1496,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["randimage"], author, image=filename, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1397,8 +1550,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["image"], author, image=filename, text=text, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1449,11 +1602,14 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["resize"], author, image=filename, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
+        if self.ALLOW_RESIZE:
+            path = str(cog_data_path(self)) + f"/{guild.id}/{filename}"
+            asyncio.create_task(self.resize_cache.warm(path))
         await ctx.send(_("Trigger `{name}` set.").format(name=name))
 
     @retrigger.command()
@@ -1479,8 +1635,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
         author = ctx.message.author.id
         new_trigger = Trigger(name, regex, ["ban"], author, created_at=ctx.message.id)
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1509,8 +1665,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
         author = ctx.message.author.id
         new_trigger = Trigger(name, regex, ["kick"], author, created_at=ctx.message.id)
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1542,8 +1698,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["react"], author, text=emojis, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1570,8 +1726,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
         author = ctx.message.author.id
         new_trigger = Trigger(name, regex, ["publish"], author, created_at=ctx.message.id)
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1607,8 +1763,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["command"], author, text=command, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1660,8 +1816,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["mock"], author, text=command, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1702,8 +1858,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             created_at=ctx.message.id,
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1745,8 +1901,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["add_role"], author, text=role_ids, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1788,8 +1944,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             name, regex, ["remove_role"], author, text=role_ids, created_at=ctx.message.id
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -1855,8 +2011,8 @@ class ReTrigger(TriggerHandler, commands.Cog):
             created_at=ctx.message.id,
         )
         if ctx.guild.id not in self.triggers:
-            self.triggers[ctx.guild.id] = []
-        self.triggers[ctx.guild.id].append(new_trigger)
+            self.triggers[ctx.guild.id] = TriggerRegistry()
+        self.triggers[ctx.guild.id].add(new_trigger)
         trigger_list = await self.config.guild(guild).trigger_list()
         trigger_list[name] = await new_trigger.to_json()
         await self.config.guild(guild).trigger_list.set(trigger_list)
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+try:
+    import regex as re
+except ImportError:
+    import re
+
+log = logging.getLogger("red.trusty-cogs.ReTrigger")
+
+PatternKey = Tuple[int, str]
+
+# how often to check for a result on event loops without add_reader support
+POLL_INTERVAL = 0.005
+
+
+class RegexTimeout(TimeoutError):
+    """
+    Raised when a worker had to be killed because a pattern ran past its budget
+
+    `key` is the `(guild_id, trigger_name)` of the pattern the worker was running
+    or None if the worker stopped responding before it reached any pattern.
+    """
+
+    def __init__(self, key: Optional[PatternKey]):
+        super().__init__(key)
+        self.key = key
+
+
+def batch_findall(
+    patterns: Dict[PatternKey, Tuple[int, Pattern]],
+    contents: List[str],
+    jobs: List[Tuple[PatternKey, int, int]],
+    timeout: float,
+    current=None,
+) -> List[Tuple[str, bool, list, float]]:
+    """
+    Run every candidate pattern for a single message inside one worker call
+
+    `jobs` is a list of `(key, version, content_index)` referencing patterns already
+    registered in `patterns` where `content_index` points at the text in `contents`
+    that pattern should be searched against. When `current` is supplied the index
+    of the job being run is written to it so a watchdog knows which pattern hung.
+
+    Returns one `(name, within_time, matches, elapsed)` tuple per job in the same
+    order so the caller can disable any pattern that took longer than `timeout`
+    on its own.
+    """
+    results: List[Tuple[str, bool, list, float]] = []
+    for index, (key, version, content_index) in enumerate(jobs):
+        name = key[1]
+        version_pattern = patterns.get(key)
+        if version_pattern is None or version_pattern[0] != version:
+            # compile failed in this worker, treat it like any other regex error
+            results.append((name, True, [], 0.0))
+            continue
+        if current is not None:
+            current.value = index
+        start = time.perf_counter()
+        try:
+            matches = version_pattern[1].findall(contents[content_index])
+        except Exception:
+            results.append((name, True, [], time.perf_counter() - start))
+            continue
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed <= timeout, matches, elapsed))
+    return results
+
+
+def _worker(conn: Connection, current) -> None:
+    """
+    Worker process main loop
+
+    Compiled patterns are kept here keyed by `(guild_id, trigger_name)` along with
+    the version they were compiled from so searches only need to send the key.
+    """
+    patterns: Dict[PatternKey, Tuple[int, Pattern]] = {}
+    while True:
+        try:
+            op, *args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if op == "register":
+            for key, version, pattern, flags in args[0]:
+                try:
+                    patterns[key] = (version, re.compile(pattern, flags))
+                except Exception:
+                    patterns.pop(key, None)
+        elif op == "unregister":
+            for key in args[0]:
+                patterns.pop(key, None)
+        elif op == "search":
+            conn.send(batch_findall(patterns, *args, current=current))
+        elif op == "close":
+            break
+
+
+class PatternWorker:
+    """
+    Parent side handle of a single worker process
+
+    The worker writes the index of the pattern it is running into shared memory.
+    While a search is outstanding the watchdog checks that index twice every
+    `timeout` seconds and once the same pattern has been running for a full
+    `timeout` it kills the process with SIGKILL and reports which pattern was
+    responsible.
+    """
+
+    def __init__(self, ctx):
+        self.current = ctx.Value("i", -1, lock=False)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker, args=(child_conn, self.current), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.registered: Dict[PatternKey, int] = {}
+        self.stale: List[PatternKey] = []
+
+    async def recv(self) -> Any:
+        """Wait for the next message from the worker without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+
+        def set_readable():
+            if not readable.done():
+                readable.set_result(None)
+
+        fileno = self.conn.fileno()
+        try:
+            loop.add_reader(fileno, set_readable)
+        except NotImplementedError:
+            # the proactor event loop on windows can't watch pipes
+            while not self.conn.poll():
+                await asyncio.sleep(POLL_INTERVAL)
+            return self.conn.recv()
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fileno)
+        return self.conn.recv()
+
+    async def run(self, contents: List[str], jobs: list, timeout: float) -> list:
+        """
+        Send a search to the worker and watch it until it answers
+
+        Raises `RegexTimeout` after killing the process if a single pattern
+        runs for longer than `timeout`.
+        """
+        self.current.value = -1
+        self.conn.send(("search", contents, jobs, timeout))
+        receive = asyncio.ensure_future(self.recv())
+        last = None
+        unchanged = 0
+        while True:
+            done, __ = await asyncio.wait({receive}, timeout=timeout / 2)
+            if done:
+                return receive.result()
+            running = self.current.value
+            unchanged = unchanged + 1 if running == last else 0
+            last = running
+            if unchanged >= 2:
+                # seen at three checks in a row so it has run for at least `timeout`
+                receive.cancel()
+                self.kill()
+                raise RegexTimeout(jobs[running][0] if running >= 0 else None)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.conn.close()
+
+
+class PatternPool:
+    """
+    Supervised pool of regex worker processes
+
+    Every worker keeps trigger patterns compiled in memory. Patterns are
+    registered once per worker and searches reference them by
+    `(guild_id, trigger_name, version)` so the pattern itself is never sent
+    with a search. A trigger's version changes whenever its regex is replaced
+    which invalidates the copy held by each worker.
+
+    Searches are awaited directly on the event loop so no executor threads are
+    used. A worker that hangs on a pattern is killed and replaced on its own
+    leaving the rest of the pool untouched.
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        self.ctx = multiprocessing.get_context()
+        self.size = processes or os.cpu_count() or 1
+        self.patterns: Dict[PatternKey, Tuple[int, str, int]] = {}
+        self.workers = [PatternWorker(self.ctx) for i in range(self.size)]
+        self._available: Optional[asyncio.Queue] = None
+
+    @property
+    def available(self) -> asyncio.Queue:
+        if self._available is None:
+            self._available = asyncio.Queue()
+            for worker in self.workers:
+                self._available.put_nowait(worker)
+        return self._available
+
+    def register(self, guild_id: int, trigger) -> None:
+        """Record the current pattern for a trigger, workers pick it up before their next search"""
+        version = self.patterns.get((guild_id, trigger.name), (None,))[0]
+        if version == trigger.version:
+            return
+        self.patterns[(guild_id, trigger.name)] = (
+            trigger.version,
+            trigger.regex.pattern,
+            trigger.regex.flags,
+        )
+
+    def unregister(self, guild_id: int, name: str) -> None:
+        key = (guild_id, name)
+        self.patterns.pop(key, None)
+        for worker in self.workers:
+            if worker.registered.pop(key, None) is not None:
+                worker.stale.append(key)
+
+    def _sync(self, worker: PatternWorker, keys: List[PatternKey]) -> None:
+        """Send any missing or outdated patterns to an idle worker"""
+        if worker.stale:
+            worker.conn.send(("unregister", worker.stale))
+            worker.stale = []
+        to_register = []
+        for key in keys:
+            version, pattern, flags = self.patterns[key]
+            if worker.registered.get(key) != version:
+                to_register.append((key, version, pattern, flags))
+                worker.registered[key] = version
+        if to_register:
+            worker.conn.send(("register", to_register))
+
+    def _respawn(self, worker: PatternWorker) -> PatternWorker:
+        """Replace a dead or killed worker, the new one is synced on its first search"""
+        if worker.process.is_alive():
+            worker.kill()
+        new_worker = PatternWorker(self.ctx)
+        self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    async def preload(self, guild_id: int, triggers: list) -> None:
+        """Register a guild's triggers and compile them in every worker up front"""
+        for trigger in triggers:
+            self.register(guild_id, trigger)
+        keys = [(guild_id, t.name) for t in triggers]
+        workers = [await self.available.get() for i in range(self.size)]
+        try:
+            for index, worker in enumerate(workers):
+                try:
+                    self._sync(worker, keys)
+                except (BrokenPipeError, OSError):
+                    workers[index] = self._respawn(worker)
+        finally:
+            for worker in workers:
+                self.available.put_nowait(worker)
+
+    async def search(
+        self, guild_id: int, contents: List[str], jobs: List[Tuple[Any, int]], timeout: float
+    ) -> List[Tuple[str, bool, list, float]]:
+        """
+        Search a list of `(trigger, content_index)` in one worker
+
+        Raises `RegexTimeout` naming the offending trigger if the worker had to be killed.
+        """
+        for trigger, __ in jobs:
+            self.register(guild_id, trigger)
+        keys = [(guild_id, t.name) for t, __ in jobs]
+        worker = await self.available.get()
+        try:
+            self._sync(worker, keys)
+            return await worker.run(
+                contents, [(key, t.version, i) for key, (t, i) in zip(keys, jobs)], timeout
+            )
+        except RegexTimeout:
+            worker = self._respawn(worker)
+            raise
+        except (BrokenPipeError, EOFError, OSError):
+            log.error("ReTrigger regex worker died unexpectedly, restarting it.", exc_info=True)
+            worker = self._respawn(worker)
+            raise
+        except asyncio.CancelledError:
+            # we can't know what state the pipe was left in
+            worker = self._respawn(worker)
+            raise
+        finally:
+            self.available.put_nowait(worker)
+
+    def close(self) -> None:
+        for worker in self.workers:
+            try:
+                worker.conn.send(("close",))
+            except Exception:
+                pass
+
+    def join(self) -> None:
+        for worker in self.workers:
+            worker.process.join(5)
+            if worker.process.is_alive():
+                # still stuck on a bad pattern
+                worker.process.kill()
@@ -0,0 +1,61 @@
+from typing import Dict, FrozenSet, Iterable, Set
+
+import discord
+
+
+def message_scope(message: discord.Message) -> FrozenSet[int]:
+    """
+    Every ID an allowlist or blocklist entry could match for a message
+
+    That's the channel, its category, the author and the author's roles
+    other than @everyone.
+    """
+    channel = message.channel
+    ids = {channel.id, message.author.id}
+    category_id = getattr(channel, "category_id", None)
+    if category_id:
+        ids.add(category_id)
+    for role in getattr(message.author, "roles", []):
+        if role.is_default():
+            continue
+        ids.add(role.id)
+    return frozenset(ids)
+
+
+class TriggerScope:
+    """
+    Per guild index of where triggers are allowed to run
+
+    Triggers with an allowlist are indexed by each channel, category, user
+    and role on it. Triggers without one run everywhere except the IDs on
+    their blocklist. Finding the triggers that can run for a message is
+    then a handful of set lookups instead of checking every trigger.
+    """
+
+    def __init__(self, triggers: Iterable, version: int):
+        self.version = version
+        self.unrestricted: Set[str] = set()
+        self.allowed: Dict[int, Set[str]] = {}
+        self.blocked: Dict[int, Set[str]] = {}
+        for trigger in triggers:
+            if trigger.whitelist:
+                # an allowlist always takes priority over the blocklist
+                for obj_id in trigger.whitelist:
+                    self.allowed.setdefault(obj_id, set()).add(trigger.name)
+                continue
+            self.unrestricted.add(trigger.name)
+            for obj_id in trigger.blacklist:
+                self.blocked.setdefault(obj_id, set()).add(trigger.name)
+
+    def triggers_for(self, ids: FrozenSet[int]) -> Set[str]:
+        """Returns the names of the triggers allowed to run given the IDs from `message_scope`"""
+        result = set(self.unrestricted)
+        for obj_id in ids:
+            blocked = self.blocked.get(obj_id)
+            if blocked:
+                result -= blocked
+        for obj_id in ids:
+            allowed = self.allowed.get(obj_id)
+            if allowed:
+                result |= allowed
+        return result
@@ -0,0 +1,27 @@
+import re
+from types import SimpleNamespace
+
+from retrigger.prefilter import TriggerPrefilter, extract_literals, normalize
+
+
+def _prefilter(pattern: str) -> TriggerPrefilter:
+    regex = re.compile(pattern)
+    trigger = SimpleNamespace(name="test", literals=extract_literals(regex), ocr_search=False)
+    return TriggerPrefilter([trigger], 0)
+
+
+def test_dotted_capital_i_folds_to_i():
+    assert normalize("İx") == "ix"
+    assert normalize("ıx") == "ix"
+
+
+def test_ignorecase_i_matches_dotted_capital_i():
+    pattern = "(?i)ix"
+    assert re.search(pattern, "İx")
+    assert "test" in _prefilter(pattern).candidates("İx")
+
+
+def test_ignorecase_i_matches_dotless_i():
+    pattern = "(?i)ix"
+    assert re.search(pattern, "ıx")
+    assert "test" in _prefilter(pattern).candidates("ıx")
@@ -1,15 +1,14 @@
 import asyncio
-import functools
 import logging
 import os
 import random
 import string
+import time
 from copy import copy
 from datetime import datetime
 from io import BytesIO
 from multiprocessing import TimeoutError
-from multiprocessing.pool import Pool
-from typing import Any, Dict, List, Literal, Pattern, Tuple, cast, Optional
+from typing import Any, Dict, List, Literal, Pattern, Set, Tuple, cast, Optional
 
 import aiohttp
 import discord
@@ -20,24 +19,17 @@ from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator
 from redbot.core.utils.chat_formatting import escape, humanize_list
 
+from .cache import TTLCache
 from .converters import Trigger
+from .edits import EditQueue
 from .message import ReTriggerMessage
-
-try:
-    from PIL import Image, ImageSequence
-
-    try:
-        import pytesseract
-
-        ALLOW_OCR = True
-    except ImportError:
-        ALLOW_OCR = False
-
-    ALLOW_RESIZE = True
-except ImportError:
-    ALLOW_RESIZE = False
-    ALLOW_OCR = False
-
+from .ocr import ALLOW_OCR, OCRReader
+from .prefilter import TriggerPrefilter
+from .profiling import OCR_BUCKET, TriggerProfiler
+from .registry import TriggerRegistry
+from .resize import ALLOW_RESIZE, ResizeCache
+from .sandbox import PatternPool, RegexTimeout
+from .scope import TriggerScope, message_scope
 
 try:
     import regex as re
@@ -57,6 +49,20 @@ IMAGE_REGEX: Pattern = re.compile(
     r"(?:(?:https?):\/\/)?[\w\/\-?=%.]+\.(?:png|jpg|jpeg)+", flags=re.I
 )
 
+# how long in seconds a guild's prefixes and a member's mod status are trusted
+PREFIX_TTL = 60
+MOD_TTL = 300
+# seconds an inline search may take before the trigger is moved to the regex sandbox
+INLINE_BUDGET = 0.05
+# core commands that change the prefixes or who counts as a mod
+PREFIX_COMMANDS = ("set prefix", "set serverprefix")
+MOD_ROLE_COMMANDS = (
+    "set addadminrole",
+    "set removeadminrole",
+    "set addmodrole",
+    "set removemodrole",
+)
+
 
 class TriggerHandler:
     """
@@ -65,30 +71,60 @@ class TriggerHandler:
 
     config: Config
     bot: Red
-    re_pool: Pool
-    triggers: Dict[int, List[Trigger]]
+    re_pool: PatternPool
+    ocr_reader: OCRReader
+    resize_cache: ResizeCache
+    edit_queue: EditQueue
+    prefix_cache: TTLCache
+    mod_cache: TTLCache
+    profiler: TriggerProfiler
+    triggers: Dict[int, TriggerRegistry]
+    prefilters: Dict[int, TriggerPrefilter]
     trigger_timeout: int
+    batch_search: bool
     ALLOW_RESIZE: bool = ALLOW_RESIZE
     ALLOW_OCR: bool = ALLOW_OCR
 
     def __init__(self, *args):
         self.config: Config
         self.bot: Red
-        self.re_pool: Pool
-        self.triggers: Dict[int, List[Trigger]]
+        self.re_pool: PatternPool
+        self.ocr_reader: OCRReader
+        self.resize_cache: ResizeCache
+        self.edit_queue: EditQueue
+        self.prefix_cache: TTLCache
+        self.mod_cache: TTLCache
+        self.profiler: TriggerProfiler
+        self.triggers: Dict[int, TriggerRegistry]
+        self.prefilters: Dict[int, TriggerPrefilter]
+        self.scopes: Dict[int, TriggerScope]
+        self.dirty_counts: Dict[int, Set[str]]
         self.trigger_timeout: int
+        self.batch_search: bool
         self.ALLOW_RESIZE = ALLOW_RESIZE
         self.ALLOW_OCR = ALLOW_OCR
 
     async def remove_trigger_from_cache(self, guild_id: int, trigger: Trigger) -> None:
-        try:
-            for t in self.triggers[guild_id]:
-                if t.name == trigger.name:
-                    self.triggers[guild_id].remove(t)
-        except ValueError:
-            # it will get removed on the next reload of the cog
-            log.info("Trigger can't be removed :blobthinking:")
-            pass
+        if guild_id in self.triggers:
+            self.triggers[guild_id].remove(trigger.name)
+
+    def get_prefilter(self, guild_id: int) -> TriggerPrefilter:
+        """Returns the literal prefilter for the guild rebuilding it if the triggers changed"""
+        triggers = self.triggers[guild_id]
+        prefilter = self.prefilters.get(guild_id)
+        if prefilter is None or prefilter.version != triggers.version:
+            prefilter = TriggerPrefilter(triggers, triggers.version)
+            self.prefilters[guild_id] = prefilter
+        return prefilter
+
+    def get_scope(self, guild_id: int) -> TriggerScope:
+        """Returns the allowlist and blocklist index for the guild rebuilding it if the triggers changed"""
+        triggers = self.triggers[guild_id]
+        scope = self.scopes.get(guild_id)
+        if scope is None or scope.version != triggers.version:
+            scope = TriggerScope(triggers, triggers.version)
+            self.scopes[guild_id] = scope
+        return scope
 
     async def can_edit(self, author: discord.Member, trigger: Trigger) -> bool:
         """Chekcs to see if the member is allowed to edit the trigger"""
@@ -99,39 +135,15 @@ class TriggerHandler:
         if author is author.guild.owner and "mock" not in trigger.response_type:
             return True
 
-    async def check_bw_list(self, trigger: Trigger, message: discord.Message) -> bool:
-        can_run = True
-        author: discord.Member = cast(discord.Member, message.author)
-        channel: discord.TextChannel = cast(discord.TextChannel, message.channel)
-        if trigger.whitelist:
-            can_run = False
-            if channel.id in trigger.whitelist:
-                can_run = True
-            if channel.category_id and channel.category_id in trigger.whitelist:
-                can_run = True
-            if message.author.id in trigger.whitelist:
-                can_run = True
-            for role in author.roles:
-                if role.is_default():
-                    continue
-                if role.id in trigger.whitelist:
-                    can_run = True
-            return can_run
-        else:
-            if channel.id in trigger.blacklist:
-                can_run = False
-            if channel.category_id and channel.category_id in trigger.blacklist:
-                can_run = False
-            if message.author.id in trigger.blacklist:
-                can_run = False
-            for role in author.roles:
-                if role.is_default():
-                    continue
-                if role.id in trigger.blacklist:
-                    can_run = False
-        return can_run
-
     async def is_mod_or_admin(self, member: discord.Member) -> bool:
+        key = (member.guild.id, member.id)
+        result = self.mod_cache.get(key)
+        if result is None:
+            result = await self._is_mod_or_admin(member)
+            self.mod_cache.set(key, result)
+        return result
+
+    async def _is_mod_or_admin(self, member: discord.Member) -> bool:
         guild = member.guild
         if member == guild.owner:
             return True
@@ -143,6 +155,26 @@ class TriggerHandler:
             return True
         return False
 
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        if before.roles != after.roles:
+            self.mod_cache.pop((after.guild.id, after.id))
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: commands.Context) -> None:
+        """Drop cached prefixes and mod checks when the settings behind them change"""
+        if ctx.command is None:
+            return
+        name = ctx.command.qualified_name
+        if name in PREFIX_COMMANDS:
+            if name == "set serverprefix" and ctx.guild:
+                self.prefix_cache.pop(ctx.guild.id)
+            else:
+                self.prefix_cache.clear()
+        elif name in MOD_ROLE_COMMANDS and ctx.guild:
+            guild_id = ctx.guild.id
+            self.mod_cache.remove_if(lambda key: key[0] == guild_id)
+
     async def make_guild_folder(self, directory) -> None:
         if not directory.is_dir():
             log.info("Creating guild folder")
@@ -237,68 +269,25 @@ class TriggerHandler:
             else:
                 responses.append(message.content)
 
-    def resize_image(self, size: int, image: str) -> discord.File:
-        length, width = (16, 16)  # Start with the smallest size we want to upload
-        with Image.open(image) as im:
-            if size <= 0:
-                size = 1
-            im.thumbnail((length * size, width * size), Image.ANTIALIAS)
-            byte_array = BytesIO()
-            im.save(byte_array, format="PNG")
-            byte_array.seek(0)
-            return discord.File(byte_array, filename="resize.png")
-
-    def resize_gif(self, size: int, image: str) -> discord.File:
-        img_list = []
-        with Image.open(image) as im:
-            if size <= 0:
-                size = 1
-            length, width = (16 * size, 16 * size)
-            start_list = [frame.copy() for frame in ImageSequence.Iterator(im)]
-            for frame in start_list:
-                frame.thumbnail((length, width), Image.ANTIALIAS)
-                img_list.append(frame)
-        byte_array = BytesIO()
-        img_list[0].save(
-            byte_array, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
-        )
-        byte_array.seek(0)
-        return discord.File(byte_array, filename="resize.gif")
-
     async def check_trigger_cooldown(self, message: discord.Message, trigger: Trigger) -> bool:
-        now = datetime.now().timestamp()
-        if trigger.cooldown:
-            if trigger.cooldown["style"] in ["guild", "server"]:
-                last = trigger.cooldown["last"]
-                time = trigger.cooldown["time"]
-                if (now - last) > time:
-                    trigger.cooldown["last"] = now
-                    return False
-                else:
-                    return True
-            else:
-                style = trigger.cooldown["style"]
-                snowflake = getattr(message, style)
-                if snowflake.id not in [x["id"] for x in trigger.cooldown["last"]]:
-                    trigger.cooldown["last"].append({"id": snowflake.id, "last": now})
-                    return False
-                else:
-                    entity_list = trigger.cooldown["last"]
-                    for entity in entity_list:
-                        if entity["id"] == snowflake.id:
-                            last = entity["last"]
-                            time = trigger.cooldown["time"]
-                            if (now - last) > time:
-                                trigger.cooldown["last"].remove({"id": snowflake.id, "last": last})
-                                trigger.cooldown["last"].append({"id": snowflake.id, "last": now})
-                                return False
-                            else:
-                                return True
-        return False
+        if not trigger.cooldown:
+            return False
+        snowflake = None
+        if not trigger.cooldown.per_guild:
+            snowflake = getattr(message, trigger.cooldown.style).id
+        return trigger.cooldown.update(snowflake)
+
+    async def get_prefixes(self, message: discord.Message) -> List[str]:
+        """Returns the prefixes for the message's guild checking the prefix cache first"""
+        prefix_list = self.prefix_cache.get(message.guild.id)
+        if prefix_list is None:
+            prefix_list = await self.bot.command_prefix(self.bot, message)
+            self.prefix_cache.set(message.guild.id, prefix_list)
+        return prefix_list
 
     async def check_is_command(self, message: discord.Message) -> bool:
         """Checks if the message is a bot command"""
-        prefix_list = await self.bot.command_prefix(self.bot, message)
+        prefix_list = await self.get_prefixes(message)
         msg = message.content
         is_command = False
         for prefix in prefix_list:
@@ -332,20 +321,14 @@ class TriggerHandler:
             return
         if "guild_id" not in payload.data:
             return
-        if "bot" in payload.data["author"]:
+        if int(payload.data["guild_id"]) not in self.triggers:
             return
-        channel = self.bot.get_channel(int(payload.data["channel_id"]))
-        try:
-            message = await channel.fetch_message(int(payload.data["id"]))
-        except (discord.errors.Forbidden, discord.errors.NotFound):
-            log.debug(
-                _("I don't have permission to read channel history or cannot find the message.")
-            )
-            return
-        except Exception:
-            log.info("Could not find channel or message", exc_info=True)
-            # If we can't find the channel ignore it
+        if "bot" in payload.data.get("author", {}):
             return
+        # the message is built or fetched once the user stops editing it
+        self.edit_queue.add(payload.data)
+
+    async def check_edited_message(self, message: discord.Message) -> None:
         if message.author.bot:
             # somehow we got a bot through the previous check :thonk:
             return
@@ -376,20 +359,26 @@ class TriggerHandler:
 
         autoimmune = getattr(self.bot, "is_automod_immune", None)
         auto_mod = ["delete", "kick", "ban", "add_role", "remove_role"]
+        scan = message.content
+        if message.attachments:
+            scan += " " + " ".join(f.filename for f in message.attachments)
+        candidates = self.get_prefilter(guild.id).candidates(scan)
+        candidates &= self.get_scope(guild.id).triggers_for(message_scope(message))
+        searches: List[Tuple[Trigger, str]] = []
         for trigger in self.triggers[guild.id]:
             if not trigger.enabled:
                 continue
+            if trigger.name not in candidates:
+                continue
             if edit and trigger.ignore_edits:
                 continue
             if trigger.chance:
                 if random.randint(0, trigger.chance) != 0:
                     continue
 
-            allowed_trigger = await self.check_bw_list(trigger, message)
+            # allowlists and blocklists are already applied by the guild's scope index
             is_auto_mod = trigger.response_type in auto_mod
-            if not allowed_trigger:
-                continue
-            if allowed_trigger and (is_auto_mod and is_mod):
+            if is_auto_mod and is_mod:
                 continue
             # log.debug(f"Checking trigger {trigger.name}")
             if is_command and not trigger.ignore_commands:
@@ -441,11 +430,28 @@ class TriggerHandler:
             content = message.content
             if trigger.read_filenames and message.attachments:
                 content = message.content + " " + " ".join(f.filename for f in message.attachments)
+            searches.append((trigger, content))
 
-            if trigger.ocr_search and ALLOW_OCR:
-                content += await self.get_image_text(message)
-
-            search = await self.safe_regex_search(guild, trigger, content)
+        if not searches:
+            return
+        ocr_triggers = [t for t, __ in searches if t.ocr_search]
+        if ALLOW_OCR and ocr_triggers and self.has_images(message):
+            # read the images once and only when a trigger that passed every check wants them
+            with self.profiler.timer(guild.id, OCR_BUCKET, "ocr"):
+                ocr_text = await self.get_image_text(message)
+            searches = [(t, c + ocr_text if t.ocr_search else c) for t, c in searches]
+        results: Dict[int, Tuple[bool, list]] = {}
+        if self.batch_search and not await self.config.guild(guild).bypass():
+            # only patterns the analyzer flagged or that were slow inline go to the pool
+            sandboxed = [(i, s) for i, s in enumerate(searches) if s[0].risk is not None]
+            if sandboxed:
+                batch = await self.batch_regex_search(guild, [s for __, s in sandboxed])
+                if batch is not None:
+                    results = {i: result for (i, __), result in zip(sandboxed, batch)}
+        for index, (trigger, content) in enumerate(searches):
+            search = results.get(index)
+            if search is None:
+                search = await self.safe_regex_search(guild, trigger, content)
             if not search[0]:
                 trigger.enabled = False
                 return
@@ -453,9 +459,15 @@ class TriggerHandler:
                 if await self.check_trigger_cooldown(message, trigger):
                     continue
                 trigger.count += 1
-                await self.perform_trigger(message, trigger, search[1])
+                self.dirty_counts.setdefault(guild.id, set()).add(trigger.name)
+                with self.profiler.timer(guild.id, trigger.name, "action"):
+                    await self.perform_trigger(message, trigger, search[1])
                 return
 
+    @staticmethod
+    def has_images(message: discord.Message) -> bool:
+        return bool(message.attachments) or IMAGE_REGEX.search(message.content) is not None
+
     async def get_image_text(self, message: discord.Message) -> str:
         """
         This function is built to asynchronously search images for text using pytesseract
@@ -464,31 +476,15 @@ class TriggerHandler:
         image links and all attachments on the message
         then runs them through pytesseract. All contents
         from pytesseract are returned as a string.
+
+        Results are cached per image by `OCRReader` so reposted images aren't read again.
         """
         content = " "
         for attachment in message.attachments:
-            temp = BytesIO()
-            await attachment.save(temp)
-            task = functools.partial(pytesseract.image_to_string, Image.open(temp))
-            new_task = self.bot.loop.run_in_executor(None, task)
-            try:
-                content += await asyncio.wait_for(new_task, timeout=5)
-            except asyncio.TimeoutError:
-                pass
+            content += await self.ocr_reader.read_attachment(attachment)
         good_image_url = IMAGE_REGEX.findall(message.content)
         for link in good_image_url:
-            temp = BytesIO()
-            async with aiohttp.ClientSession() as session:
-                async with session.get(link) as resp:
-                    data = await resp.read()
-                    temp.write(data)
-                    temp.seek(0)
-            task = functools.partial(pytesseract.image_to_string, Image.open(temp))
-            new_task = self.bot.loop.run_in_executor(None, task)
-            try:
-                content += await asyncio.wait_for(new_task, timeout=5)
-            except asyncio.TimeoutError:
-                pass
+            content += await self.ocr_reader.read_url(link)
         return content
 
     async def safe_regex_search(
@@ -497,20 +493,57 @@ class TriggerHandler:
         """
         Mostly safe regex search to prevent reDOS from user defined regex patterns
 
-        This works by running the regex pattern inside a process pool defined at the
-        cog level and then checking that process in the default executor to keep
-        things asynchronous. If the process takes too long to complete we log a
-        warning and remove the trigger from trying to run again.
+        This works by running the regex pattern inside a supervised process pool
+        defined at the cog level whose workers keep the compiled pattern in memory
+        and waiting on the worker from the event loop. If the pattern takes too
+        long the worker running it is killed and replaced, we log a warning and
+        remove the trigger from trying to run again.
+
+        Patterns the analyzer didn't flag skip the pool and run inline. If one
+        of those takes longer than `INLINE_BUDGET` it's moved to the pool
+        from then on.
         """
         if await self.config.guild(guild).bypass():
             # log.debug(f"Bypassing safe regex in guild {guild.name} ({guild.id})")
-            return (True, trigger.regex.findall(content))
+            with self.profiler.timer(guild.id, trigger.name, "regex"):
+                return (True, trigger.regex.findall(content))
+        if trigger.risk is None:
+            start = time.perf_counter()
+            try:
+                matches = trigger.regex.findall(content)
+            except Exception:
+                log.error(
+                    f"ReTrigger encountered an error {trigger.name} {trigger.regex} in {guild.name} {guild.id}",
+                    exc_info=True,
+                )
+                return (True, [])
+            elapsed = time.perf_counter() - start
+            self.profiler.record(guild.id, trigger.name, "regex", elapsed)
+            if elapsed > INLINE_BUDGET:
+                trigger.demote()
+                async with self.config.guild(guild).trigger_list() as trigger_list:
+                    if trigger.name in trigger_list:
+                        trigger_list[trigger.name]["sandbox"] = True
+                log.warning(
+                    "ReTrigger: %s in %s (%s) was slow to search inline, "
+                    "it will run in the regex sandbox from now on.",
+                    trigger.name,
+                    guild.name,
+                    guild.id,
+                )
+            return (True, matches)
         try:
-            process = self.re_pool.apply_async(trigger.regex.findall, (content,))
-            task = functools.partial(process.get, timeout=self.trigger_timeout)
-            new_task = self.bot.loop.run_in_executor(None, task)
-            search = await asyncio.wait_for(new_task, timeout=self.trigger_timeout + 5)
-        except TimeoutError:
+            search = await self.re_pool.search(
+                guild.id, [content], [(trigger, 0)], self.trigger_timeout
+            )
+            __, within_time, matches, elapsed = search[0]
+            self.profiler.record(guild.id, trigger.name, "regex", elapsed)
+            if not within_time:
+                raise TimeoutError
+        except TimeoutError as e:
+            if isinstance(e, RegexTimeout):
+                # the worker was killed so there's no timing from it
+                self.profiler.record(guild.id, trigger.name, "regex", self.trigger_timeout)
             error_msg = (
                 "ReTrigger: regex process took too long. Removing from memory "
                 f"{guild.name} ({guild.id}) Author {trigger.author} "
@@ -519,14 +552,6 @@ class TriggerHandler:
             log.warning(error_msg)
             return (False, [])
             # we certainly don't want to be performing multiple triggers if this happens
-        except asyncio.TimeoutError:
-            error_msg = (
-                "ReTrigger: regex asyncio timed out."
-                f"{guild.name} ({guild.id}) Author {trigger.author} "
-                f"Offending regex `{trigger.regex.pattern}` Name: {trigger.name}"
-            )
-            log.warning(error_msg)
-            return (False, [])
         except Exception:
             log.error(
                 f"ReTrigger encountered an error {trigger.name} {trigger.regex} in {guild.name} {guild.id}",
@@ -534,7 +559,66 @@ class TriggerHandler:
             )
             return (True, [])
         else:
-            return (True, search)
+            return (True, matches)
+
+    async def batch_regex_search(
+        self, guild: discord.Guild, searches: List[Tuple[Trigger, str]]
+    ) -> Optional[List[Tuple[bool, list]]]:
+        """
+        Search every candidate trigger for a message with a single worker job
+
+        Each pattern is timed on its own inside the worker so a slow pattern is
+        reported the same way `safe_regex_search` would. If a pattern hangs the
+        worker is killed and the search is repeated without it. If the worker
+        fails for any other reason we return None so the caller can fall back to
+        searching each trigger individually.
+        """
+        contents: List[str] = []
+        jobs: List[Tuple[Trigger, int]] = []
+        for trigger, content in searches:
+            if content not in contents:
+                contents.append(content)
+            jobs.append((trigger, contents.index(content)))
+        hung: Set[str] = set()
+        while True:
+            try:
+                batch = await self.re_pool.search(
+                    guild.id,
+                    contents,
+                    [j for j in jobs if j[0].name not in hung],
+                    self.trigger_timeout,
+                )
+            except RegexTimeout as e:
+                if e.key is None:
+                    return None
+                hung.add(e.key[1])
+                self.profiler.record(guild.id, e.key[1], "regex", self.trigger_timeout)
+                continue
+            except Exception:
+                log.error(
+                    f"ReTrigger encountered an error batch searching in {guild.name} {guild.id}",
+                    exc_info=True,
+                )
+                return None
+            break
+        found = {}
+        for name, within_time, matches, elapsed in batch:
+            found[name] = (within_time, matches)
+            self.profiler.record(guild.id, name, "regex", elapsed)
+        results: List[Tuple[bool, list]] = []
+        for trigger, __ in searches:
+            within_time, matches = found.get(trigger.name, (False, []))
+            if not within_time:
+                # disable it here, an earlier match would return before check_triggers gets to it
+                trigger.enabled = False
+                error_msg = (
+                    "ReTrigger: regex process took too long. Removing from memory "
+                    f"{guild.name} ({guild.id}) Author {trigger.author} "
+                    f"Offending regex `{trigger.regex.pattern}` Name: {trigger.name}"
+                )
+                log.warning(error_msg)
+            results.append((within_time, matches))
+        return results
 
     async def perform_trigger(
         self, message: discord.Message, trigger: Trigger, find: List[str]
@@ -552,17 +636,11 @@ class TriggerHandler:
         if "resize" in trigger.response_type and own_permissions.attach_files and ALLOW_RESIZE:
             await channel.trigger_typing()
             path = str(cog_data_path(self)) + f"/{guild.id}/{trigger.image}"
-            if path.lower().endswith(".gif"):
-                task = functools.partial(self.resize_gif, size=len(find[0]) - 3, image=path)
-            else:
-                task = functools.partial(self.resize_image, size=len(find[0]) - 3, image=path)
-            new_task = self.bot.loop.run_in_executor(None, task)
-            try:
-                file: discord.File = await asyncio.wait_for(new_task, timeout=60)
-            except asyncio.TimeoutError:
-                pass
+            data = await self.resize_cache.get(path, len(find[0]) - 3)
+            filename = "resize.gif" if path.lower().endswith(".gif") else "resize.png"
             try:
-                await channel.send(file=file)
+                if data is not None:
+                    await channel.send(file=discord.File(BytesIO(data), filename=filename))
             except discord.errors.Forbidden:
                 log.debug(error_in, exc_info=True)
             except Exception:
@@ -793,14 +871,14 @@ class TriggerHandler:
                 for command in command_response:
                     command = await self.convert_parms(message, command, trigger, find)
                     msg = copy(message)
-                    prefix_list = await self.bot.command_prefix(self.bot, message)
+                    prefix_list = await self.get_prefixes(message)
                     msg.content = prefix_list[0] + command
                     msg = ReTriggerMessage(message=msg)
                     self.bot.dispatch("message", msg)
             else:
                 msg = copy(message)
                 command = await self.convert_parms(message, str(trigger.text), trigger, find)
-                prefix_list = await self.bot.command_prefix(self.bot, message)
+                prefix_list = await self.get_prefixes(message)
                 msg.content = prefix_list[0] + command
                 msg = ReTriggerMessage(message=msg)
                 self.bot.dispatch("message", msg)
@@ -814,7 +892,7 @@ class TriggerHandler:
                     if not mocker:
                         return
                     msg.author = mocker
-                    prefix_list = await self.bot.command_prefix(self.bot, message)
+                    prefix_list = await self.get_prefixes(message)
                     msg.content = prefix_list[0] + command
                     msg = ReTriggerMessage(message=msg)
                     self.bot.dispatch("message", msg)
@@ -825,7 +903,7 @@ class TriggerHandler:
                 if not mocker:
                     return  # We'll exit early if the author isn't on the server anymore
                 msg.author = mocker
-                prefix_list = await self.bot.command_prefix(self.bot, message)
+                prefix_list = await self.get_prefixes(message)
                 msg.content = prefix_list[0] + command
                 msg = ReTriggerMessage(message=msg)
                 self.bot.dispatch("message", msg)
@@ -987,6 +1065,8 @@ class TriggerHandler:
 
     async def remove_trigger(self, guild_id: int, trigger_name: str) -> bool:
         """Returns true or false if the trigger was removed"""
+        self.re_pool.unregister(guild_id, trigger_name)
+        self.profiler.remove(guild_id, trigger_name)
         async with self.config.guild_from_id(guild_id).trigger_list() as trigger_list:
             for triggers in trigger_list:
                 # trigger = Trigger.from_json(trigger_list[triggers])
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+log = logging.getLogger("red.trusty-cogs.Starboard")
+
+
+class EditDebouncer:
+    """
+    Combines rapid changes to a starboard message into one edit
+
+    The first change to a message schedules its callback `delay` seconds
+    later, changes inside that window are picked up by the same callback
+    since it reads the latest count when it runs.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._pending: Dict[int, asyncio.Task] = {}
+
+    def schedule(self, key: int, callback: Callable[[], Awaitable[None]]) -> None:
+        if key in self._pending:
+            return
+        self._pending[key] = asyncio.create_task(self._run(key, callback))
+
+    async def _run(self, key: int, callback: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            # changes made while the edit is being sent schedule a new one
+            self._pending.pop(key, None)
+        try:
+            await callback()
+        except Exception:
+            log.exception("Error editing starboard message.")
+
+    def cancel(self) -> None:
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
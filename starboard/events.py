@@ -1,32 +1,58 @@
 import logging
 import asyncio
-from typing import Dict, Literal, Union, cast, Optional
+import re
+from typing import Dict, List, Literal, Set, Tuple, Union, cast, Optional
 from datetime import datetime, timedelta
 
 import discord
-from discord.utils import snowflake_time
+from discord.utils import time_snowflake
 from redbot import VersionInfo, version_info
 from redbot.core import Config, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils import AsyncIter
 
+from .debounce import EditDebouncer
 from .starboard_entry import StarboardEntry, StarboardMessage, FakePayload
+from .store import MessageStore
 
 _ = Translator("Starboard", __file__)
 log = logging.getLogger("red.trusty-cogs.Starboard")
 
+# how often recently starred messages are checked for missed reaction events
+RECONCILE_INTERVAL = 60 * 60
+CUSTOM_EMOJI_RE = re.compile(r"<a?:\w+:(\d+)>")
+
+
+def emoji_key(emoji: Union[discord.PartialEmoji, discord.Emoji, str]) -> str:
+    """
+    Normalize an emoji for routing reactions to starboards
+
+    Custom emojis are keyed by ID so renaming them doesn't matter and
+    unicode emojis have the variation selector stripped.
+    """
+    emoji = str(emoji)
+    match = CUSTOM_EMOJI_RE.fullmatch(emoji)
+    if match:
+        return match.group(1)
+    return emoji.replace("\ufe0f", "")
+
 
 @cog_i18n(_)
 class StarboardEvents:
     bot: Red
     config: Config
     starboards: Dict[int, StarboardEntry]
+    emoji_routes: Dict[int, Dict[str, List[StarboardEntry]]]
+    edit_debouncer: EditDebouncer
+    store: MessageStore
 
     def __init__(self, bot):
         self.bot: Red
         self.config: Config
         self.starboards: Dict[int, Dict[str, StarboardEntry]]
+        self.emoji_routes: Dict[int, Dict[str, List[StarboardEntry]]]
+        self.edit_debouncer: EditDebouncer
+        self.store: MessageStore
 
     async def _build_starboard_info(self, ctx: commands.Context, starboard: StarboardEntry):
         channel_perms = ctx.channel.permissions_for(ctx.guild.me)
@@ -164,53 +190,97 @@ class StarboardEvents:
         em.set_footer(text=f"{channel.guild.name} | {channel.name}")
         return em
 
+    def _build_emoji_routes(self, guild_id: int) -> None:
+        """Map each emoji to the enabled starboards in the guild using it"""
+        routes: Dict[str, List[StarboardEntry]] = {}
+        for starboard in self.starboards.get(guild_id, {}).values():
+            if starboard.enabled:
+                routes.setdefault(emoji_key(starboard.emoji), []).append(starboard)
+        self.emoji_routes[guild_id] = routes
+
+    def _get_routes(
+        self, guild_id: Optional[int], emoji: Union[discord.PartialEmoji, str]
+    ) -> List[StarboardEntry]:
+        if guild_id is None:
+            return []
+        return self.emoji_routes.get(guild_id, {}).get(emoji_key(emoji), [])
+
     async def _save_starboards(self, guild: discord.Guild) -> None:
+        """Save the starboard settings, messages are saved individually in `store`"""
+        self._build_emoji_routes(guild.id)
         await self.config.guild(guild).starboards.set(
             {n: s.to_json() for n, s in self.starboards[guild.id].items()}
         )
 
-    async def _get_count(
-        self, message_entry: StarboardMessage, starboard: StarboardEntry, remove: Optional[int]
-    ) -> StarboardMessage:
-        """This will update the unique user list for the starboard message object"""
-        orig_channel = self.bot.get_channel(message_entry.original_channel)
-        new_channel = self.bot.get_channel(message_entry.new_channel)
-        orig_reaction = []
-        if orig_channel:
-            try:
-                orig_msg = await orig_channel.fetch_message(message_entry.original_message)
-                orig_reaction = [
-                    r for r in orig_msg.reactions if str(r.emoji) == str(starboard.emoji)
-                ]
-            except discord.errors.Forbidden:
-                pass
-        new_reaction = []
-        if new_channel:
+    def _update_stats(
+        self, guild_id: int, starboard: StarboardEntry, changes: List[Tuple[str, int, int]]
+    ) -> None:
+        """Apply `(kind, id, change)` to a starboard's statistics in memory and in the store"""
+        if not changes:
+            return
+        for kind, key, change in changes:
+            starboard.stats.update(kind, key, change)
+        self.store.update_stats(guild_id, starboard.name, changes)
+
+    def _record_stars(
+        self,
+        guild_id: int,
+        starboard: StarboardEntry,
+        star_message: StarboardMessage,
+        before: Set[int],
+    ) -> None:
+        """Update the statistics for users who starred or unstarred a message"""
+        added = star_message.reactions - before
+        removed = before - star_message.reactions
+        changes = [("given", user, 1) for user in added]
+        changes += [("given", user, -1) for user in removed]
+        if len(added) != len(removed):
+            changes.append(("received", star_message.author, len(added) - len(removed)))
+        self._update_stats(guild_id, starboard, changes)
+
+    async def _get_reactions(
+        self, message_entry: StarboardMessage, starboard: StarboardEntry, strict: bool = False
+    ) -> Optional[Set[int]]:
+        """
+        Fetch everyone who has reacted to the original and starboard message
+
+        This is only used to seed the counter of a new message and to
+        reconcile counters, reaction events keep them current otherwise.
+        With `strict` None is returned if either message can't be fetched
+        since its reactions are unknown rather than gone.
+        """
+        reactions = []
+        for channel_id, message_id in (
+            (message_entry.original_channel, message_entry.original_message),
+            (message_entry.new_channel, message_entry.new_message),
+        ):
+            if not channel_id or not message_id:
+                continue
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                if strict:
+                    return None
+                continue
             try:
-                new_msg = await new_channel.fetch_message(message_entry.new_message)
-                new_reaction = [
-                    r for r in new_msg.reactions if str(r.emoji) == str(starboard.emoji)
-                ]
-            except discord.errors.Forbidden:
-                pass
-
-        reactions = orig_reaction + new_reaction
+                msg = await channel.fetch_message(message_id)
+            except (discord.errors.NotFound, discord.errors.Forbidden):
+                if strict:
+                    return None
+                continue
+            reactions += [
+                r for r in msg.reactions if emoji_key(r.emoji) == emoji_key(starboard.emoji)
+            ]
+        users = set()
         for reaction in reactions:
-            log.debug(reactions)
             async for user in reaction.users():
+                if user.bot:
+                    continue
                 if not await self._check_roles(starboard, user):
                     continue
-                if not starboard.selfstar and user.id == orig_msg.author.id:
+                if not starboard.selfstar and user.id == message_entry.author:
                     continue
-                if user.id not in message_entry.reactions and not user.bot:
-                    log.debug("Adding user")
-                    message_entry.reactions.append(user.id)
-        if remove and remove in message_entry.reactions:
-            log.debug("Removing user")
-            message_entry.reactions.remove(remove)
-        message_entry.reactions = list(set(message_entry.reactions))
-        log.debug(message_entry.reactions)
-        return message_entry
+                users.add(user.id)
+        return users
 
     async def is_mod_or_admin(self, member: discord.Member) -> bool:
         guild = member.guild
@@ -226,112 +296,264 @@ class StarboardEvents:
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        if not self._get_routes(payload.guild_id, payload.emoji):
+            return
         await self._update_stars(payload)
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        if not self._get_routes(payload.guild_id, payload.emoji):
+            return
         await self._update_stars(payload, remove=payload.user_id)
 
     @commands.Cog.listener()
-    async def on_raw_reaction_clear(self, payload: discord.RawReactionActionEvent) -> None:
-        channel = self.bot.get_channel(id=payload.channel_id)
-        try:
-            guild = channel.guild
-        except AttributeError:
-            # DMChannels don't have guilds
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent) -> None:
+        if not self.emoji_routes.get(payload.guild_id):
+            return
+        await self._clear_stars(payload, list(self.starboards[payload.guild_id].values()))
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(
+        self, payload: discord.RawReactionClearEmojiEvent
+    ) -> None:
+        starboards = self._get_routes(payload.guild_id, payload.emoji)
+        if not starboards:
+            return
+        await self._clear_stars(payload, starboards)
+
+    async def _clear_stars(
+        self,
+        payload: Union[discord.RawReactionClearEvent, discord.RawReactionClearEmojiEvent],
+        starboards: List[StarboardEntry],
+    ) -> None:
+        """Recount a tracked message from the API after its reactions were cleared"""
+        starboards = [s for s in starboards if s.get_message(payload.message_id)]
+        if not starboards:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild:
             return
         if version_info >= VersionInfo.from_str("3.4.0"):
             if await self.bot.cog_disabled_in_guild(self, guild):
                 return
-        try:
-            msg = await channel.fetch_message(id=payload.message_id)
-        except (discord.errors.NotFound, discord.Forbidden):
-            return
-        if guild.id not in self.starboards:
-            return
-        # starboards = await self.config.guild(guild).starboards()
-        for name, starboard in self.starboards[guild.id].items():
-            # starboard = StarboardEntry.from_json(s_board)
-            star_channel = self.bot.get_channel(starboard.channel)
-            if not star_channel:
-                continue
-            async with starboard.lock:
-                await self._loop_messages(payload, starboard, star_channel, msg, None)
+        for starboard in starboards:
+            await self._reconcile(guild, starboard, payload.message_id)
+
+    async def _reconcile(
+        self,
+        guild: discord.Guild,
+        starboard: StarboardEntry,
+        message_id: int,
+    ) -> None:
+        """
+        Check a message's counter against the reactions on discord
+
+        Users who reacted are replaced with what discord has so missed adds
+        and removes are both corrected. Stars given with `[p]star` don't have
+        a reaction to find so they're kept.
+        """
+        async with starboard.lock:
+            star_message = starboard.get_message(message_id)
+            if star_message is None:
+                return
+            reactions = await self._get_reactions(star_message, starboard, strict=True)
+            if reactions is None:
+                # a deleted or hidden message isn't the same as nobody reacting
+                return
+            reactions |= star_message.manual
+            if reactions == star_message.reactions:
+                return
+            before = star_message.reactions
+            star_message.reactions = reactions
+            self._record_stars(guild.id, starboard, star_message, before)
+            await self._update_count(guild, starboard, star_message)
+
+    async def reconcile_counts(self) -> None:
+        """
+        Periodically reconcile the counters of recently starred messages
+        to pick up any reaction events that were missed
+        """
+        while True:
+            await asyncio.sleep(RECONCILE_INTERVAL)
+            for guild_id, starboards in list(self.starboards.items()):
+                guild = self.bot.get_guild(guild_id)
+                if not guild:
+                    continue
+                for starboard in list(starboards.values()):
+                    message_ids = starboard.recently_updated
+                    starboard.recently_updated = set()
+                    for message_id in message_ids:
+                        try:
+                            await self._reconcile(guild, starboard, message_id)
+                        except Exception:
+                            log.exception("Error reconciling starboard counts.")
 
     async def _update_stars(
         self,
         payload: Union[discord.RawReactionActionEvent, FakePayload],
         remove: Optional[int] = None,
+        starboard: Optional[StarboardEntry] = None,
     ) -> None:
+        """
+        Update every starboard using the payload's emoji or only `starboard`
+        when given, which is how `[p]star` and `[p]unstar` pick their board
+        """
         channel = self.bot.get_channel(id=payload.channel_id)
         try:
             guild = channel.guild
         except AttributeError:
             # DMChannels don't have guilds
             return
-        if guild.id not in self.starboards:
+        if starboard is not None:
+            starboards = [starboard]
+        else:
+            starboards = self._get_routes(guild.id, payload.emoji)
+        if not starboards:
             return
         if version_info >= VersionInfo.from_str("3.4.0"):
             if await self.bot.cog_disabled_in_guild(self, guild):
                 return
-        try:
-            msg = await channel.fetch_message(id=payload.message_id)
-        except (discord.errors.NotFound, discord.Forbidden):
-            return
         member = guild.get_member(payload.user_id)
         if member and member.bot:
             return
-        starboard = None
-        for name, s_board in self.starboards[guild.id].items():
-            if s_board.emoji == str(payload.emoji):
-                starboard = s_board
-        if not starboard:
-            return
+        for board in starboards:
+            await self._update_board(payload, board, channel, member, remove)
+
+    async def _update_board(
+        self,
+        payload: Union[discord.RawReactionActionEvent, FakePayload],
+        starboard: StarboardEntry,
+        channel: discord.TextChannel,
+        member: Optional[discord.Member],
+        remove: Optional[int],
+    ) -> None:
+        guild = channel.guild
         if not starboard.enabled:
             return
         if not await self._check_roles(starboard, member):
             return
         if not await self._check_channel(starboard, channel):
             return
-
-        star_channel = guild.get_channel(starboard.channel)
-        if not star_channel:
-            return
-        if member.id == msg.author.id and not starboard.selfstar:
+        if not guild.get_channel(starboard.channel):
             return
         async with starboard.lock:
-            if await self._loop_messages(payload, starboard, star_channel, msg, remove):
+            star_message = starboard.get_message(payload.message_id)
+            msg = None
+            before: Set[int] = set()
+            if star_message is None:
+                if remove:
+                    return
+                try:
+                    msg = await channel.fetch_message(id=payload.message_id)
+                except (discord.errors.NotFound, discord.errors.Forbidden):
+                    return
+                if payload.user_id == msg.author.id and not starboard.selfstar:
+                    return
+                star_message = StarboardMessage(
+                    original_message=msg.id,
+                    original_channel=channel.id,
+                    new_message=None,
+                    new_channel=None,
+                    author=msg.author.id,
+                    reactions=[],
+                )
+                # the only time we need to page through reactions for a new message
+                star_message.reactions = await self._get_reactions(star_message, starboard)
+                starboard.add_message(star_message)
+                # a message starred again after it was pruned was already counted
+                # for everyone else who reacted so only record this user
+                before = star_message.reactions - {payload.user_id}
+            elif payload.user_id == star_message.author and not starboard.selfstar:
                 return
+            else:
+                before = set(star_message.reactions)
+            if remove:
+                star_message.reactions.discard(remove)
+                star_message.manual.discard(remove)
+            else:
+                star_message.reactions.add(payload.user_id)
+                if isinstance(payload, FakePayload):
+                    star_message.manual.add(payload.user_id)
+            self._record_stars(guild.id, starboard, star_message, before)
+            starboard.recently_updated.add(star_message.original_message)
+            await self._update_count(guild, starboard, star_message, msg)
 
-            star_message = StarboardMessage(
-                original_message=msg.id,
-                original_channel=channel.id,
-                new_message=None,
-                new_channel=None,
-                author=msg.author.id,
-                reactions=[payload.user_id],
-            )
-            await self._get_count(star_message, starboard, remove)
-            count = len(star_message.reactions)
+    async def _update_count(
+        self,
+        guild: discord.Guild,
+        starboard: StarboardEntry,
+        star_message: StarboardMessage,
+        msg: Optional[discord.Message] = None,
+    ) -> None:
+        """
+        Post, edit or remove the starboard message to match its counter
+
+        New posts are sent right away. Every counter change is queued in the
+        store which writes it in the background while edits to an existing
+        post are debounced by `edit_debouncer`.
+        """
+        count = len(star_message.reactions)
+        if not star_message.new_message:
             if count < starboard.threshold:
-                if star_message not in starboard.messages:
-                    self.starboards[guild.id][starboard.name].messages.append(star_message)
-                await self._save_starboards(guild)
+                self.store.upsert(guild.id, starboard.name, star_message)
+                return
+            star_channel = guild.get_channel(starboard.channel)
+            if not star_channel:
                 return
+            if msg is None:
+                channel = guild.get_channel(star_message.original_channel)
+                if not channel:
+                    return
+                try:
+                    msg = await channel.fetch_message(star_message.original_message)
+                except (discord.errors.NotFound, discord.errors.Forbidden):
+                    return
             em = await self._build_embed(guild, msg, starboard)
-            count_msg = "{} **#{}**".format(payload.emoji, count)
+            count_msg = f"{starboard.emoji} **#{count}**"
             post_msg = await star_channel.send(count_msg, embed=em)
             if starboard.autostar:
                 try:
                     await post_msg.add_reaction(starboard.emoji)
                 except Exception:
                     log.exception("Error adding autostar.")
-            if star_message not in starboard.messages:
-                self.starboards[guild.id][starboard.name].messages.append(star_message)
-            star_message.new_message = post_msg.id
-            star_message.new_channel = star_channel.id
-            self.starboards[guild.id][starboard.name].messages.append(star_message)
-            await self._save_starboards(guild)
+            starboard.set_new_message(star_message, post_msg.id, star_channel.id)
+            self._update_stats(guild.id, starboard, [("posts", star_message.original_channel, 1)])
+            self.store.upsert(guild.id, starboard.name, star_message)
+            return
+        # save the counter now, the debounced edit only updates discord
+        self.store.upsert(guild.id, starboard.name, star_message)
+        self.edit_debouncer.schedule(
+            star_message.new_message,
+            lambda: self._edit_starboard_message(guild, starboard, star_message),
+        )
+
+    async def _edit_starboard_message(
+        self, guild: discord.Guild, starboard: StarboardEntry, star_message: StarboardMessage
+    ) -> None:
+        """Bring an existing starboard message up to date with the latest count"""
+        async with starboard.lock:
+            if not star_message.new_message:
+                return
+            count = len(star_message.reactions)
+            star_channel = guild.get_channel(star_message.new_channel)
+            if not star_channel:
+                return
+            try:
+                message_edit = await star_channel.fetch_message(star_message.new_message)
+            except (discord.errors.NotFound, discord.errors.Forbidden):
+                # starboard message may have been deleted
+                return
+            if count < starboard.threshold:
+                starboard.set_new_message(star_message, None, None)
+                self._update_stats(
+                    guild.id, starboard, [("posts", star_message.original_channel, -1)]
+                )
+                self.store.upsert(guild.id, starboard.name, star_message)
+                await message_edit.delete()
+                return
+            log.debug("Editing starboard")
+            count_message = f"{starboard.emoji} **#{count}**"
+            await message_edit.edit(content=count_message)
 
     async def red_delete_data_for_user(
         self,
@@ -343,13 +565,27 @@ class StarboardEvents:
         Method for finding users data inside the cog and deleting it.
         """
         for guild_id, starboards in self.starboards.items():
-            for starboard, entry in starboards.items():
-                for message in entry.messages:
-                    if message["author"] == user_id:
-                        self.starboards[guild_id][starboard].messages.remove(message)
-            await self.config.guild_from_id(guild_id).starboards.set(
-                {n: s.to_json() for n, s in self.starboards[guild_id].items()}
-            )
+            for name, entry in starboards.items():
+                async with entry.lock:
+                    authored = [m for m in entry.messages if m.author == user_id]
+                    # take the removed messages out of everyone else's totals
+                    changes = []
+                    for message in authored:
+                        changes += [("given", u, -1) for u in message.reactions if u != user_id]
+                        if message.new_message:
+                            changes.append(("posts", message.original_channel, -1))
+                    entry.remove_messages(authored)
+                    for message in entry.messages:
+                        if user_id not in message.reactions:
+                            continue
+                        message.reactions.discard(user_id)
+                        message.manual.discard(user_id)
+                        changes.append(("received", message.author, -1))
+                        self.store.upsert(guild_id, name, message)
+                    self._update_stats(guild_id, entry, changes)
+                    entry.stats.received.pop(user_id, None)
+                    entry.stats.given.pop(user_id, None)
+        self.store.delete_author(user_id)
 
     async def cleanup_old_messages(self) -> None:
         """This will periodically iterate through old messages
@@ -366,27 +602,20 @@ class StarboardEvents:
             guilds_ignored = 0
             to_purge = datetime.utcnow() - purge
             # Prune only the last 30 days worth of data
-            for guild_id, starboards in self.starboards.items():
+            for guild_id, starboards in list(self.starboards.items()):
                 guild = self.bot.get_guild(guild_id)
                 if not guild:
                     guilds_ignored += 1
                     continue
                 # log.debug(f"Cleaning starboard data for {guild.name} ({guild.id})")
-                for name, starboard in starboards.items():
+                for name, starboard in list(starboards.items()):
                     async with starboard.lock:
-                        to_rem = []
                         try:
-                            async for message in AsyncIter(starboard.messages, steps=500):
-                                if message.new_message:
-                                    if snowflake_time(message.new_message) < to_purge:
-                                        to_rem.append(message)
-                                else:
-                                    if snowflake_time(message.original_message) < to_purge:
-                                        to_rem.append(message)
-                            for m in to_rem:
-                                log.debug(f"Removing {m}")
-                                starboard.messages.remove(m)
-                                total_pruned += 1
+                            to_rem = starboard.prune(time_snowflake(to_purge))
+                            self.store.delete(
+                                guild.id, name, [m.original_message for m in to_rem]
+                            )
+                            total_pruned += len(to_rem)
                             if len(to_rem) > 0:
                                 log.info(
                                     f"Starboard pruned {len(to_rem)} messages that are "
@@ -394,55 +623,9 @@ class StarboardEvents:
                                 )
                         except Exception:
                             log.exception("Error trying to clenaup old starboard messages.")
-                await self._save_starboards(guild)
             if total_pruned:
                 log.info(
                     f"Starboard has pruned {total_pruned} messages and ignored {guilds_ignored} guilds."
                 )
             # Sleep 1 day but also run on cog reload
             await asyncio.sleep(60 * 60 * 24)
-
-    async def _loop_messages(
-        self,
-        payload: Union[discord.RawReactionActionEvent, FakePayload],
-        starboard: StarboardEntry,
-        star_channel: discord.TextChannel,
-        message: discord.Message,
-        remove: Optional[int],
-    ) -> bool:
-        try:
-            guild = star_channel.guild
-        except AttributeError:
-            return True
-        async for messages in AsyncIter(starboard.messages, steps=500):
-            same_message = messages.original_message == message.id
-            same_channel = messages.original_channel == payload.channel_id
-            starboard_message = messages.new_message == message.id
-            starboard_channel = messages.new_channel == payload.channel_id
-
-            if not messages.new_message or not messages.new_channel:
-                continue
-            if (same_message and same_channel) or (starboard_message and starboard_channel):
-                await self._get_count(messages, starboard, remove)
-                if remove is None:
-                    if getattr(payload, "user_id", 0) not in messages.reactions:
-                        log.debug("Adding user in _loop_messages")
-                        messages.reactions.append(payload.user_id)
-                count = len(messages.reactions)
-                log.debug(messages.reactions)
-                try:
-                    message_edit = await star_channel.fetch_message(messages.new_message)
-                except (discord.errors.NotFound, discord.errors.Forbidden):
-                    # starboard message may have been deleted
-                    return True
-                if count < starboard.threshold:
-                    messages.new_message = None
-                    messages.new_channel = None
-                    await self._save_starboards(guild)
-                    await message_edit.delete()
-                    return True
-                log.debug("Editing starboard")
-                count_message = f"{starboard.emoji} **#{count}**"
-                await message_edit.edit(content=count_message)
-                return True
-        return False
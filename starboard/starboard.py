@@ -1,21 +1,28 @@
 import logging
 import asyncio
-from typing import Union, Dict, Optional
+from typing import Union, Dict, List, Optional
 from datetime import timedelta
 
 import discord
 from redbot.core import Config, checks, commands
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils.chat_formatting import humanize_timedelta
 from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
 
 from .converters import StarboardExists
+from .debounce import EditDebouncer
 from .events import StarboardEvents
-from .starboard_entry import StarboardEntry, FakePayload
+from .starboard_entry import StarboardEntry, StarboardStats, FakePayload
+from .store import MessageStore
 
 _ = Translator("Starboard", __file__)
 log = logging.getLogger("red.trusty-cogs.Starboard")
 
+# seconds to wait before editing the count on a starboard message
+EDIT_DELAY = 5.0
+STATS_PER_PAGE = 10
+
 TimeConverter = commands.converter.TimedeltaConverter(
     minimum=timedelta(days=7), allowed_units=["days", "weeks"], default_unit="days"
 )
@@ -33,23 +40,51 @@ class Starboard(StarboardEvents, commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, 356488795)
-        self.config.register_global(purge_time=None)
+        self.config.register_global(purge_time=None, edit_delay=EDIT_DELAY)
         self.config.register_guild(starboards={})
         self.starboards: Dict[int, Dict[str, StarboardEntry]] = {}
+        self.emoji_routes: Dict[int, Dict[str, List[StarboardEntry]]] = {}
         self.cleanup_loop: Optional[asyncio.Task] = None
+        self.reconcile_loop: Optional[asyncio.Task] = None
+        self.edit_debouncer = EditDebouncer(EDIT_DELAY)
+        self.store = MessageStore(cog_data_path(self) / "messages.sqlite3")
 
     async def initialize(self) -> None:
+        self.edit_debouncer.delay = await self.config.edit_delay()
         for guild_id in await self.config.all_guilds():
             self.starboards[guild_id] = {}
             all_data = await self.config.guild(discord.Object(id=guild_id)).starboards()
+            migrated = False
             for name, data in all_data.items():
-                starboard = StarboardEntry.from_json(data)
+                if "messages" in data:
+                    # messages used to be saved in config alongside the settings
+                    starboard = StarboardEntry.from_json(data)
+                    self.store.upsert_many(guild_id, name, starboard.messages)
+                    migrated = True
+                else:
+                    messages = self.store.load(guild_id, name)
+                    starboard = StarboardEntry.from_json(data, messages)
+                starboard.stats = self.store.load_stats(guild_id, name)
+                if starboard.stats.is_empty() and starboard.messages:
+                    # totals weren't kept before so start from what's saved
+                    starboard.stats = StarboardStats.from_messages(starboard.messages)
+                    self.store.update_stats(guild_id, name, starboard.stats.to_changes())
                 self.starboards[guild_id][name] = starboard
+            if migrated:
+                log.info("Moved the starboard messages for %s into the message store", guild_id)
+                await self._save_starboards(discord.Object(id=guild_id))
+            else:
+                self._build_emoji_routes(guild_id)
         self.cleanup_loop = asyncio.create_task(self.cleanup_old_messages())
+        self.reconcile_loop = asyncio.create_task(self.reconcile_counts())
 
     def cog_unload(self):
         if self.cleanup_loop:
             self.cleanup_loop.cancel()
+        if self.reconcile_loop:
+            self.reconcile_loop.cancel()
+        self.edit_debouncer.cancel()
+        self.store.close()
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -88,6 +123,89 @@ class Starboard(StarboardEvents, commands.Cog):
             ).format(time=humanize_timedelta(timedelta=time))
         )
 
+    @starboard.command(name="editdelay")
+    @commands.is_owner()
+    async def edit_delay(self, ctx: commands.Context, seconds: float) -> None:
+        """
+        Set how long to wait before editing the count on a starboard message
+
+        Reactions within this many seconds of each other are combined into one edit
+        which keeps busy starboards from hitting discords rate limits.
+        New messages are still posted to the starboard right away.
+        `<seconds>` must be between 0 and 60.
+        """
+        if not 0 <= seconds <= 60:
+            return await ctx.send(_("The edit delay must be between 0 and 60 seconds."))
+        await self.config.edit_delay.set(seconds)
+        self.edit_debouncer.delay = seconds
+        await ctx.send(
+            _("Starboard messages will now be edited at most every {seconds} seconds.").format(
+                seconds=seconds
+            )
+        )
+
+    @starboard.command(name="stats", aliases=["leaderboard", "lb"])
+    async def starboard_stats(
+        self, ctx: commands.Context, starboard: Optional[StarboardExists]
+    ) -> None:
+        """
+        Show who receives and gives the most stars on a starboard
+
+        `[name]` is the name of the starboard, only needed if there is more than one
+        """
+        guild = ctx.guild
+        if not starboard:
+            if guild.id not in self.starboards or not self.starboards[guild.id]:
+                return await ctx.send(_("There are no starboards setup on this server!"))
+            if len(self.starboards[guild.id]) > 1:
+                return await ctx.send(
+                    _(
+                        "There's more than one starboard setup in this server. "
+                        "Please provide a name for the starboard you wish to use."
+                    )
+                )
+            starboard = list(self.starboards[guild.id].values())[0]
+        use_embeds = ctx.channel.permissions_for(ctx.guild.me).embed_links
+
+        def member(user_id: int) -> str:
+            if use_embeds:
+                return f"<@{user_id}>"
+            user = guild.get_member(user_id)
+            return user.display_name if user else str(user_id)
+
+        def channel(channel_id: int) -> str:
+            return f"<#{channel_id}>"
+
+        sections = [
+            (_("Most stars received"), starboard.stats.received, member),
+            (_("Most stars given"), starboard.stats.given, member),
+            (_("Most messages on the starboard"), starboard.stats.posts, channel),
+        ]
+        pages = []
+        for title, counter, name in sections:
+            ranked = counter.most_common()
+            for start in range(0, max(len(ranked), 1), STATS_PER_PAGE):
+                lines = [
+                    f"`#{rank}` {name(key)} - **{count}**"
+                    for rank, (key, count) in enumerate(
+                        ranked[start : start + STATS_PER_PAGE], start=start + 1
+                    )
+                ]
+                pages.append((title, "\n".join(lines) or _("Nothing has been starred yet.")))
+        msgs = []
+        for number, (title, text) in enumerate(pages, start=1):
+            title = _("{title} on {name}").format(title=title, name=starboard.name)
+            footer = _("Page {page}/{total}").format(page=number, total=len(pages))
+            if use_embeds:
+                embed = discord.Embed(
+                    title=title, description=text, colour=await self._get_colour(ctx.channel)
+                )
+                embed.set_footer(text=footer)
+                msgs.append(embed)
+            else:
+                msgs.append(f"**{title}**\n{text}\n{footer}")
+        await menu(ctx, msgs, DEFAULT_CONTROLS)
+
     @starboard.command(name="info")
     async def starboard_info(self, ctx: commands.Context) -> None:
         """
@@ -166,10 +284,11 @@ class Starboard(StarboardEvents, commands.Cog):
         roles = 0
         channels = 0
         boards = 0
-        for name, starboard in self.starboards[guild.id].items():
+        for name, starboard in list(self.starboards[guild.id].items()):
             channel = guild.get_channel(starboard.channel)
             if channel is None:
                 del self.starboards[guild.id][name]
+                self.store.delete_starboard(guild.id, name)
                 boards += 1
                 continue
             if starboard.blacklist_channel:
@@ -225,6 +344,7 @@ class Starboard(StarboardEvents, commands.Cog):
                 )
             starboard = list(self.starboards[guild.id].values())[0]
         del self.starboards[ctx.guild.id][starboard.name]
+        self.store.delete_starboard(ctx.guild.id, starboard.name)
         await self._save_starboards(ctx.guild)
         await ctx.send(_("Deleted starboard {name}").format(name=starboard.name))
 
@@ -277,7 +397,7 @@ class Starboard(StarboardEvents, commands.Cog):
             user_id=ctx.author.id,
             emoji=starboard.emoji,
         )
-        await self._update_stars(fake_payload)
+        await self._update_stars(fake_payload, starboard=starboard)
 
     @commands.command()
     @commands.guild_only()
@@ -328,7 +448,7 @@ class Starboard(StarboardEvents, commands.Cog):
             user_id=ctx.author.id,
             emoji=starboard.emoji,
         )
-        await self._update_stars(fake_payload, remove=ctx.author.id)
+        await self._update_stars(fake_payload, remove=ctx.author.id, starboard=starboard)
 
     @starboard.group(name="allowlist", aliases=["whitelist"])
     async def whitelist(self, ctx: commands.Context) -> None:
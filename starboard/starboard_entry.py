@@ -1,6 +1,8 @@
 import asyncio
+from bisect import bisect_left, bisect_right
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Iterable, Optional, Set, Tuple, Union
 
 
 @dataclass
@@ -17,7 +19,8 @@ class StarboardMessage:
     """A class to hold message objects pertaining
     To starboarded messages including the original
     message ID, and the starboard message ID
-    as well as a list of users who have added their "vote"
+    as well as the set of users who have added their "vote"
+    and the users among them who voted with `[p]star` instead of a reaction
     """
     def __init__(self, **kwargs):
         self.original_message: int = kwargs.get("original_message")
@@ -25,7 +28,8 @@ class StarboardMessage:
         self.new_message: Optional[int] = kwargs.get("new_message")
         self.new_channel: Optional[int] = kwargs.get("new_channel")
         self.author: int = kwargs.get("author")
-        self.reactions: List[int] = kwargs.get("reactions")
+        self.reactions: Set[int] = set(kwargs.get("reactions") or [])
+        self.manual: Set[int] = set(kwargs.get("manual") or [])
 
     def to_json(self) -> dict:
         return {
@@ -34,14 +38,18 @@ class StarboardMessage:
             "new_message": self.new_message,
             "new_channel": self.new_channel,
             "author": self.author,
-            "reactions": self.reactions,
+            "reactions": list(self.reactions),
+            "manual": list(self.manual),
         }
 
     @classmethod
     def from_json(cls, data: dict):
         reactions = []
+        manual = []
         if "reactions" in data:
             reactions = data["reactions"]
+        if "manual" in data:
+            manual = data["manual"]
         return cls(
             original_message=data["original_message"],
             original_channel=data["original_channel"],
@@ -49,9 +57,52 @@ class StarboardMessage:
             new_channel=data["new_channel"],
             author=data["author"],
             reactions=reactions,
+            manual=manual,
         )
 
 
+class StarboardStats:
+    """
+    Running totals for a starboard
+
+    `received` is stars received per author, `given` is stars given per
+    user and `posts` is messages currently on the starboard per channel.
+    """
+
+    KINDS = ("received", "given", "posts")
+
+    def __init__(self):
+        self.received: Counter = Counter()
+        self.given: Counter = Counter()
+        self.posts: Counter = Counter()
+
+    def update(self, kind: str, key: int, change: int) -> None:
+        counter = getattr(self, kind)
+        counter[key] += change
+        if counter[key] <= 0:
+            del counter[key]
+
+    def to_changes(self) -> Iterable[Tuple[str, int, int]]:
+        for kind in self.KINDS:
+            for key, count in getattr(self, kind).items():
+                yield (kind, key, count)
+
+    def is_empty(self) -> bool:
+        return not (self.received or self.given or self.posts)
+
+    @classmethod
+    def from_messages(cls, messages: Iterable["StarboardMessage"]):
+        """Build the totals for messages saved before statistics were kept"""
+        stats = cls()
+        for message in messages:
+            if message.reactions:
+                stats.received[message.author] += len(message.reactions)
+            stats.given.update(message.reactions)
+            if message.new_message:
+                stats.posts[message.original_channel] += 1
+        return stats
+
+
 @dataclass
 class StarboardEntry:
     def __init__(self, **kwargs):
@@ -65,14 +116,101 @@ class StarboardEntry:
         self.selfstar: bool = kwargs.get("selfstar", False)
         self.blacklist_role: List[int] = kwargs.get("blacklist_role", [])
         self.whitelist_role: List[int] = kwargs.get("whitelist_role", [])
-        self.messages: List[StarboardMessage] = kwargs.get(
-            "messages", []
-        )
         self.blacklist_channel: List[int] = kwargs.get("blacklist_channel", [])
         self.whitelist_channel: List[int] = kwargs.get("whitelist_channel", [])
         self.threshold: int = kwargs.get("threshold", 1)
         self.autostar: bool = kwargs.get("autostar", False)
         self.lock: asyncio.Lock = asyncio.Lock()
+        # original message ID's whose counters changed since they were last reconciled
+        self.recently_updated: Set[int] = set()
+        self.stats: StarboardStats = kwargs.get("stats") or StarboardStats()
+        # original and starboard message ID's to their entry in messages
+        self.original_messages: Dict[int, StarboardMessage] = {}
+        self.new_messages: Dict[int, StarboardMessage] = {}
+        for message in kwargs.get("messages", []):
+            self._index_message(message)
+        # messages are kept sorted by the snowflake of their latest post
+        # so pruning old messages is a bisect and a slice
+        self.messages: List[StarboardMessage] = sorted(
+            self.original_messages.values(), key=self._sort_key
+        )
+        self._keys: List[int] = [self._sort_key(m) for m in self.messages]
+
+    @staticmethod
+    def _sort_key(message: StarboardMessage) -> int:
+        return message.new_message or message.original_message
+
+    def _insert_sorted(self, message: StarboardMessage) -> None:
+        key = self._sort_key(message)
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self.messages.insert(index, message)
+
+    def _remove_sorted(self, message: StarboardMessage) -> None:
+        key = self._sort_key(message)
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key:
+            if self.messages[index] is message:
+                del self._keys[index]
+                del self.messages[index]
+                return
+            index += 1
+
+    def _index_message(self, message: StarboardMessage) -> None:
+        self.original_messages[message.original_message] = message
+        if message.new_message:
+            self.new_messages[message.new_message] = message
+
+    def get_message(self, message_id: int) -> Optional[StarboardMessage]:
+        """Find the stored message by either its original or starboard message ID"""
+        return self.original_messages.get(message_id) or self.new_messages.get(message_id)
+
+    def add_message(self, message: StarboardMessage) -> None:
+        if message.original_message in self.original_messages:
+            return
+        self._insert_sorted(message)
+        self._index_message(message)
+
+    def set_new_message(
+        self, message: StarboardMessage, new_message: Optional[int], new_channel: Optional[int]
+    ) -> None:
+        """Change the starboard post for a message keeping the indexes up to date"""
+        tracked = message.original_message in self.original_messages
+        if tracked:
+            self._remove_sorted(message)
+        if message.new_message:
+            self.new_messages.pop(message.new_message, None)
+        message.new_message = new_message
+        message.new_channel = new_channel
+        if new_message:
+            self.new_messages[new_message] = message
+        if tracked:
+            self._insert_sorted(message)
+
+    def remove_messages(self, messages: List[StarboardMessage]) -> None:
+        to_remove = {m.original_message for m in messages}
+        if not to_remove:
+            return
+        for message in messages:
+            self.original_messages.pop(message.original_message, None)
+            if message.new_message:
+                self.new_messages.pop(message.new_message, None)
+        self.messages = [m for m in self.messages if m.original_message not in to_remove]
+        self._keys = [self._sort_key(m) for m in self.messages]
+
+    def prune(self, before: int) -> List[StarboardMessage]:
+        """
+        Remove and return every message last posted before the snowflake `before`
+        """
+        index = bisect_left(self._keys, before)
+        removed = self.messages[:index]
+        del self.messages[:index]
+        del self._keys[:index]
+        for message in removed:
+            self.original_messages.pop(message.original_message, None)
+            if message.new_message:
+                self.new_messages.pop(message.new_message, None)
+        return removed
 
     def to_json(self) -> dict:
         return {
@@ -84,7 +222,6 @@ class StarboardEntry:
             "selfstar": self.selfstar,
             "blacklist_role": self.blacklist_role,
             "whitelist_role": self.whitelist_role,
-            "messages": [m.to_json() for m in self.messages],
             "blacklist_channel": self.blacklist_channel,
             "whitelist_channel": self.whitelist_channel,
             "threshold": self.threshold,
@@ -92,7 +229,11 @@ class StarboardEntry:
         }
 
     @classmethod
-    def from_json(cls, data: dict):
+    def from_json(cls, data: dict, messages: Optional[List[StarboardMessage]] = None):
+        """
+        `messages` are the board's messages from the message store, when not
+        given they're read from `data` which is how they used to be saved
+        """
         colour = "user"
         selfstar = False
         autostar = False
@@ -102,9 +243,8 @@ class StarboardEntry:
             selfstar = data["selfstar"]
         if "colour" in data:
             colour = data["colour"]
-        messages = []
-        if "messages" in data:
-            messages = [StarboardMessage.from_json(m) for m in data["messages"]]
+        if messages is None:
+            messages = [StarboardMessage.from_json(m) for m in data.get("messages", [])]
         return cls(
             name=data["name"],
             channel=data["channel"],
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .starboard_entry import StarboardMessage, StarboardStats
+
+log = logging.getLogger("red.trusty-cogs.Starboard")
+
+# seconds changes are collected before they're written together
+FLUSH_DELAY = 5.0
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        guild_id INTEGER NOT NULL,
+        starboard TEXT NOT NULL,
+        original_message INTEGER NOT NULL,
+        original_channel INTEGER NOT NULL,
+        new_message INTEGER,
+        new_channel INTEGER,
+        author INTEGER NOT NULL,
+        reactions TEXT NOT NULL,
+        manual TEXT NOT NULL DEFAULT '[]',
+        PRIMARY KEY (guild_id, starboard, original_message)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS messages_original ON messages (original_message)",
+    "CREATE INDEX IF NOT EXISTS messages_new ON messages (new_message)",
+    "CREATE INDEX IF NOT EXISTS messages_author ON messages (author)",
+    """
+    CREATE TABLE IF NOT EXISTS stats (
+        guild_id INTEGER NOT NULL,
+        starboard TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, starboard, kind, id)
+    )
+    """,
+)
+# columns added after the table was first created
+MIGRATIONS = {"manual": "ALTER TABLE messages ADD COLUMN manual TEXT NOT NULL DEFAULT '[]'"}
+UPSERT = """
+    INSERT OR REPLACE INTO messages (
+        guild_id, starboard, original_message, original_channel,
+        new_message, new_channel, author, reactions, manual
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+STATS_INSERT = "INSERT OR IGNORE INTO stats VALUES (?, ?, ?, ?, 0)"
+STATS_UPDATE = """
+    UPDATE stats SET count = count + ?
+    WHERE guild_id = ? AND starboard = ? AND kind = ? AND id = ?
+"""
+STATS_DELETE = """
+    DELETE FROM stats
+    WHERE guild_id = ? AND starboard = ? AND kind = ? AND id = ? AND count <= 0
+"""
+COLUMNS = "original_message, original_channel, new_message, new_channel, author, reactions, manual"
+
+
+class MessageStore:
+    """
+    sqlite storage for starboarded messages
+
+    Every change to a message is written as a single row so the cost of
+    saving doesn't grow with the history of the starboard. Board settings
+    stay in Config.
+
+    Message and statistics changes are held in memory for `FLUSH_DELAY`
+    seconds and written together on a single background thread so reaction
+    events never wait on sqlite. Deletes go through the same thread after
+    dropping any pending change they would undo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="starboard_store")
+        # (guild_id, starboard, original_message) to the row waiting to be saved
+        self._pending: Dict[Tuple[int, str, int], tuple] = {}
+        # (change, guild_id, starboard, kind, id) waiting to be added to the stats
+        self._pending_stats: List[Tuple[int, int, str, str, int]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # set once the executor is shut down, changes after that are dropped
+        self._closed = False
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _row(guild_id: int, starboard: str, message: StarboardMessage) -> tuple:
+        return (
+            guild_id,
+            starboard,
+            message.original_message,
+            message.original_channel,
+            message.new_message,
+            message.new_channel,
+            message.author,
+            json.dumps(list(message.reactions)),
+            json.dumps(list(message.manual)),
+        )
+
+    def load(self, guild_id: int, starboard: str) -> List[StarboardMessage]:
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {COLUMNS} FROM messages WHERE guild_id = ? AND starboard = ?",
+                (guild_id, starboard),
+            ).fetchall()
+        return [
+            StarboardMessage(
+                original_message=original_message,
+                original_channel=original_channel,
+                new_message=new_message,
+                new_channel=new_channel,
+                author=author,
+                reactions=json.loads(reactions),
+                manual=json.loads(manual),
+            )
+            for (
+                original_message,
+                original_channel,
+                new_message,
+                new_channel,
+                author,
+                reactions,
+                manual,
+            ) in rows
+        ]
+
+    def _schedule(self) -> None:
+        if self._flush_task is None and not self._closed:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(FLUSH_DELAY)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write every pending change"""
+        if self._closed:
+            return
+        await asyncio.wrap_future(self._submit_pending())
+
+    def _submit_pending(self):
+        rows = list(self._pending.values())
+        stats = self._pending_stats
+        self._pending = {}
+        self._pending_stats = []
+        return self._executor.submit(self._write, rows, stats)
+
+    def _write(self, rows: List[tuple], stats: List[Tuple[int, int, str, str, int]]) -> None:
+        if not rows and not stats:
+            return
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(UPSERT, rows)
+                keys = [(g, s, kind, key) for __, g, s, kind, key in stats]
+                self.conn.executemany(STATS_INSERT, keys)
+                self.conn.executemany(STATS_UPDATE, stats)
+                self.conn.executemany(STATS_DELETE, keys)
+        except sqlite3.Error:
+            log.exception("Error saving starboard messages")
+
+    def _run(self, description: str, statement: Callable[[sqlite3.Connection], None]) -> None:
+        """Run a statement on the store's thread after anything already queued"""
+
+        def run():
+            try:
+                with self._lock, self.conn:
+                    statement(self.conn)
+            except sqlite3.Error:
+                log.exception("Error %s", description)
+
+        if self._closed:
+            return
+
+        self._executor.submit(run)
+
+    def upsert(self, guild_id: int, starboard: str, message: StarboardMessage) -> None:
+        if self._closed:
+            return
+        key = (guild_id, starboard, message.original_message)
+        self._pending[key] = self._row(guild_id, starboard, message)
+        self._schedule()
+
+    def upsert_many(
+        self, guild_id: int, starboard: str, messages: Iterable[StarboardMessage]
+    ) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT, (self._row(guild_id, starboard, m) for m in messages))
+
+    def delete(self, guild_id: int, starboard: str, message_ids: Iterable[int]) -> None:
+        message_ids = list(message_ids)
+        for message_id in message_ids:
+            self._pending.pop((guild_id, starboard, message_id), None)
+        self._run(
+            "deleting starboard messages",
+            lambda conn: conn.executemany(
+                "DELETE FROM messages "
+                "WHERE guild_id = ? AND starboard = ? AND original_message = ?",
+                ((guild_id, starboard, message_id) for message_id in message_ids),
+            ),
+        )
+
+    def delete_starboard(self, guild_id: int, starboard: str) -> None:
+        self._pending = {k: v for k, v in self._pending.items() if k[:2] != (guild_id, starboard)}
+        self._pending_stats = [c for c in self._pending_stats if c[1:3] != (guild_id, starboard)]
+
+        def delete(conn: sqlite3.Connection) -> None:
+            for table in ("messages", "stats"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE guild_id = ? AND starboard = ?",
+                    (guild_id, starboard),
+                )
+
+        self._run("deleting a starboard", delete)
+
+    def delete_author(self, author: int) -> None:
+        # the author is the seventh column of a row
+        self._pending = {k: v for k, v in self._pending.items() if v[6] != author}
+        self._pending_stats = [
+            c
+            for c in self._pending_stats
+            if not (c[3] in ("received", "given") and c[4] == author)
+        ]
+
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM messages WHERE author = ?", (author,))
+            conn.execute(
+                "DELETE FROM stats WHERE kind IN ('received', 'given') AND id = ?", (author,)
+            )
+
+        self._run("deleting a user's starboard data", delete)
+
+    def load_stats(self, guild_id: int, starboard: str) -> StarboardStats:
+        stats = StarboardStats()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT kind, id, count FROM stats WHERE guild_id = ? AND starboard = ?",
+                (guild_id, starboard),
+            ).fetchall()
+        for kind, key, count in rows:
+            stats.update(kind, key, count)
+        return stats
+
+    def update_stats(
+        self, guild_id: int, starboard: str, changes: Iterable[Tuple[str, int, int]]
+    ) -> None:
+        """Add each `(kind, id, change)` to the saved statistics"""
+        if self._closed:
+            return
+        self._pending_stats.extend(
+            (change, guild_id, starboard, kind, key) for kind, key, change in changes
+        )
+        self._schedule()
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def close(self) -> None:
+        """Write what's pending and close the connection once the queue is done"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._submit_pending()
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+from starboard.events import StarboardEvents
+from starboard.starboard_entry import FakePayload, StarboardEntry
+
+GUILD_ID = 1
+CHANNEL_ID = 2
+STARBOARD_ID = 3
+AUTHOR_ID = 4
+MESSAGE_ID = 5
+
+
+class StubUsers:
+    def __init__(self, users):
+        self.users = list(users)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.users:
+            raise StopAsyncIteration
+        return self.users.pop(0)
+
+
+class StubReaction:
+    def __init__(self, emoji, user_ids):
+        self.emoji = emoji
+        self.user_ids = user_ids
+
+    def users(self):
+        return StubUsers(SimpleNamespace(id=u, bot=False) for u in self.user_ids)
+
+
+class StubChannel:
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.guild = guild
+        self.category_id = None
+        self.message = None
+
+    def is_nsfw(self):
+        return False
+
+    async def fetch_message(self, message_id=None, id=None):
+        return self.message
+
+
+class StubStore:
+    def __init__(self):
+        self.stats = []
+
+    def upsert(self, guild_id, starboard, message):
+        pass
+
+    def update_stats(self, guild_id, starboard, changes):
+        self.stats.extend(changes)
+
+
+class StubEvents(StarboardEvents):
+    def __init__(self, channels):
+        self.bot = SimpleNamespace(get_channel=lambda channel_id: channels.get(channel_id))
+        self.store = StubStore()
+
+
+def star(events, starboard, channel, reactors, user_id):
+    channel.message = SimpleNamespace(
+        id=MESSAGE_ID,
+        author=SimpleNamespace(id=AUTHOR_ID),
+        reactions=[StubReaction(starboard.emoji, reactors)],
+    )
+    payload = FakePayload(
+        channel_id=CHANNEL_ID, message_id=MESSAGE_ID, user_id=user_id, emoji=starboard.emoji
+    )
+    asyncio.run(events._update_board(payload, starboard, channel, None, None))
+
+
+def test_star_prune_star_counts_each_user_once():
+    guild = SimpleNamespace(id=GUILD_ID)
+    channel = StubChannel(CHANNEL_ID, guild)
+    starboard_channel = StubChannel(STARBOARD_ID, guild)
+    channels = {CHANNEL_ID: channel, STARBOARD_ID: starboard_channel}
+    guild.get_channel = channels.get
+    events = StubEvents(channels)
+    starboard = StarboardEntry(name="test", channel=STARBOARD_ID, emoji="⭐", threshold=10)
+
+    star(events, starboard, channel, [6], 6)
+    assert starboard.stats.given == {6: 1}
+    assert starboard.stats.received == {AUTHOR_ID: 1}
+
+    starboard.prune(MESSAGE_ID + 1)
+    assert starboard.get_message(MESSAGE_ID) is None
+
+    star(events, starboard, channel, [6, 7], 7)
+    assert starboard.get_message(MESSAGE_ID).reactions == {6, 7}
+    assert starboard.stats.given == {6: 1, 7: 1}
+    assert starboard.stats.received == {AUTHOR_ID: 2}